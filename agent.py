@@ -1,14 +1,21 @@
 import os
+import asyncio
+import threading
 from typing import Annotated, List, TypedDict
 from langgraph.graph import StateGraph, END
 from models import AgentState, Checkpoint, MCQ
-from search_utils import gather_context_from_web, gather_context_from_notes, validate_relevance
-from context_utils import chunk_text, setup_vector_store, generate_summary, generate_mcqs, evaluate_answer
+from search_utils import gather_context_from_notes, validate_relevance, avalidate_relevance, gather_snippets_from_web, agather_snippets_from_web, format_snippets, search_combined_query, asearch_combined_query
+from context_utils import setup_vector_store, index_context, needs_retrieval, generate_summary, generate_mcqs, generate_study_material, evaluate_answer, agenerate_summary, agenerate_mcqs
+from context_artifacts import get_artifact
+from question_dedup import generate_unique_mcqs, agenerate_unique_mcqs, QUESTION_DEDUP_ENABLED
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+# Generate the summary and the first quiz in one LLM call instead of two
+FUSED_GENERATION = os.getenv("FUSED_GENERATION", "0") == "1"
+
 def start_checkpoint(state: AgentState):
     """Initializes the checkpoint process."""
     print(f"--- Starting Checkpoint: {state['checkpoint'].topic} ---")
@@ -20,12 +27,20 @@ def gather_context_node(state: AgentState):
     print(f"--- Gathering Context for: {checkpoint.topic} ---")
     
     # Prioritize notes
-    context = gather_context_from_notes(checkpoint.topic)
+    context = gather_context_from_notes(checkpoint.topic, checkpoint.objectives)
     
+    sources = []
     if not context:
         print("No notes found, falling back to web search...")
-        context = gather_context_from_web(checkpoint.topic, checkpoint.objectives)
+        # One concurrent query per objective; each snippet remembers which objective found it
+        sources = gather_snippets_from_web(checkpoint.topic, checkpoint.objectives)
+        # Without snippets, fall back to one combined query rather than repeating the per-objective searches
+        context = format_snippets(sources) if sources else search_combined_query(checkpoint.topic, checkpoint.objectives)
     
+    return _gathered_update(state, context, sources)
+
+def _gathered_update(state: AgentState, context: str, sources: List[dict]):
+    checkpoint = state["checkpoint"]
     # Update the checkpoint object with the context
     new_checkpoint = Checkpoint(
         topic=checkpoint.topic,
@@ -36,6 +51,7 @@ def gather_context_node(state: AgentState):
     
     return {
         "gathered_info": [context],
+        "context_sources": sources,
         "checkpoint": new_checkpoint,
         "messages": state["messages"] + ["Context gathered."]
     }
@@ -46,6 +62,9 @@ def validate_context_node(state: AgentState):
     print(f"--- Validating Context ---")
     
     is_relevant, score = validate_relevance(checkpoint.topic, checkpoint.objectives, checkpoint.context)
+    return _validated_update(state, is_relevant, score)
+
+def _validated_update(state: AgentState, is_relevant: bool, score: float):
     print(f"Relevance Score: {score:.1f}%")
     
     return {
@@ -56,13 +75,17 @@ def validate_context_node(state: AgentState):
     }
 
 def process_context_node(state: AgentState):
-    """Chunks and vectors the context."""
+    """Chunks and vectors the context into a stored artifact."""
     print("--- Processing Context (Chunking & Vectoring) ---")
     checkpoint = state["checkpoint"]
-    chunks = chunk_text(checkpoint.context)
-    # Note: We don't store the vector store in the state because it's not serializable.
-    state["messages"].append(f"Processed into {len(chunks)} chunks.")
-    return {"messages": state["messages"]}
+    # The artifact (chunks, offsets, embeddings when retrieval needs them) is stored once per
+    # context hash; only the hash goes into the state, and later nodes load the artifact by it.
+    retrieval = needs_retrieval(checkpoint.context)
+    artifact = get_artifact(checkpoint.context, with_embeddings=retrieval)
+    if retrieval:
+        index_context(checkpoint.context, context_key=artifact.context_hash)
+    state["messages"].append(f"Processed into {len(artifact.chunks)} chunks.")
+    return {"context_hash": artifact.context_hash, "messages": state["messages"]}
 
 def summarize_node(state: AgentState):
     """Generates a study summary for the user."""
@@ -79,8 +102,16 @@ def generate_questions_node(state: AgentState):
     print("--- Generating MCQs ---")
     checkpoint = state["checkpoint"]
     seen = state.get("seen_questions", [])
-    mcqs = generate_mcqs(checkpoint.context, checkpoint.topic, seen_questions=seen)
-    
+    if QUESTION_DEDUP_ENABLED:
+        # History stays in the state for the semantic check; the prompt only gets a bounded avoid-list
+        mcqs = generate_unique_mcqs(checkpoint.context, checkpoint.topic, seen, objectives=checkpoint.objectives, context_key=state.get("context_hash"))
+    else:
+        # Remedial rounds must not be served the cached batch the user has already seen
+        mcqs = generate_mcqs(checkpoint.context, checkpoint.topic, seen_questions=seen, objectives=checkpoint.objectives, context_key=state.get("context_hash"), bypass_cache=bool(seen))
+    return _questions_update(state, mcqs)
+
+def _questions_update(state: AgentState, mcqs: List[MCQ]):
+    seen = state.get("seen_questions", [])
     # Track new questions to avoid them in future iterations
     new_seen = seen + [m.question for m in mcqs]
     
@@ -90,6 +121,68 @@ def generate_questions_node(state: AgentState):
         "messages": state["messages"] + [f"Generated {len(mcqs)} fresh MCQs."]
     }
 
+def study_material_node(state: AgentState):
+    """Generates the study summary and the first MCQs in a single fused call."""
+    print("--- Generating Study Material & MCQs (fused) ---")
+    checkpoint = state["checkpoint"]
+    seen = state.get("seen_questions", [])
+    summary, mcqs = generate_study_material(checkpoint.context, checkpoint.topic)
+    return {
+        "summary": summary,
+        "mcqs": mcqs,
+        "seen_questions": seen + [m.question for m in mcqs],
+        "messages": state["messages"] + ["Study material generated.", f"Generated {len(mcqs)} fresh MCQs."]
+    }
+
+# --- Async node variants ---
+# Same state updates as the nodes above, but built on ainvoke and async search so the
+# API can hold many in-flight LLM waits on one event loop.
+
+async def agather_context_node(state: AgentState):
+    """Async variant of gather_context_node."""
+    checkpoint = state["checkpoint"]
+    print(f"--- Gathering Context for: {checkpoint.topic} ---")
+    
+    # Prioritize notes
+    context = await asyncio.to_thread(gather_context_from_notes, checkpoint.topic, checkpoint.objectives)
+    
+    sources = []
+    if not context:
+        print("No notes found, falling back to web search...")
+        sources = await agather_snippets_from_web(checkpoint.topic, checkpoint.objectives)
+        context = format_snippets(sources) if sources else await asearch_combined_query(checkpoint.topic, checkpoint.objectives)
+    
+    return _gathered_update(state, context, sources)
+
+async def avalidate_context_node(state: AgentState):
+    """Async variant of validate_context_node."""
+    checkpoint = state["checkpoint"]
+    print("--- Validating Context ---")
+    
+    is_relevant, score = await avalidate_relevance(checkpoint.topic, checkpoint.objectives, checkpoint.context)
+    return _validated_update(state, is_relevant, score)
+
+async def asummarize_node(state: AgentState):
+    """Async variant of summarize_node."""
+    print("--- Generating Study Material ---")
+    checkpoint = state["checkpoint"]
+    summary = await agenerate_summary(checkpoint.context, checkpoint.topic)
+    return {
+        "summary": summary,
+        "messages": state["messages"] + ["Study material generated."]
+    }
+
+async def agenerate_questions_node(state: AgentState):
+    """Async variant of generate_questions_node."""
+    print("--- Generating MCQs ---")
+    checkpoint = state["checkpoint"]
+    seen = state.get("seen_questions", [])
+    if QUESTION_DEDUP_ENABLED:
+        mcqs = await agenerate_unique_mcqs(checkpoint.context, checkpoint.topic, seen, objectives=checkpoint.objectives, context_key=state.get("context_hash"))
+    else:
+        mcqs = await agenerate_mcqs(checkpoint.context, checkpoint.topic, seen_questions=seen, objectives=checkpoint.objectives, context_key=state.get("context_hash"), bypass_cache=bool(seen))
+    return _questions_update(state, mcqs)
+
 def verify_understanding_node(state: AgentState):
     """
     Evaluates MCQ answers and updates the score in the state.
@@ -167,19 +260,17 @@ def remedial_node(state: AgentState):
         print("="*50, flush=True)
         print(f"Relevance Score of Source Material: {state.get('relevance_score', 0):.1f}%", flush=True)
         
-        for idx in missed_indices:
+        from remediation import explain_concepts
+        
+        print("Consulting pedagogical resources for the best analogies...", flush=True)
+        explanations = explain_concepts([mcqs[idx].question for idx in missed_indices], checkpoint.context, context_key=state.get("context_hash"))
+        
+        for idx, feynman_expl in zip(missed_indices, explanations):
             mcq = mcqs[idx]
             print(f"\nReinforcing Concept: '{mcq.question}'", flush=True)
             print(f"The correct answer was: {mcq.options[mcq.correct_index]}", flush=True)
             print("-" * 30, flush=True)
             
-            from search_utils import search_for_simple_explanation
-            from context_utils import generate_feynman_explanation
-            
-            print("Consulting pedagogical resources for the best analogy...", flush=True)
-            simple_context = search_for_simple_explanation(mcq.question)
-            feynman_expl = generate_feynman_explanation(mcq.question, checkpoint.context, simple_context)
-            
             print("\nHere is a simpler way to think about it:", flush=True)
             print(feynman_expl, flush=True)
             print("--------------------------------", flush=True)
@@ -220,7 +311,6 @@ workflow.add_node("start", start_checkpoint)
 workflow.add_node("gather", gather_context_node)
 workflow.add_node("validate", validate_context_node)
 workflow.add_node("process", process_context_node)
-workflow.add_node("summarize", summarize_node)
 workflow.add_node("questions", generate_questions_node)
 workflow.add_node("verify", verify_understanding_node)
 workflow.add_node("remedial", remedial_node)
@@ -239,8 +329,15 @@ workflow.add_conditional_edges(
     }
 )
 
-workflow.add_edge("process", "summarize")
-workflow.add_edge("summarize", "questions")
+if FUSED_GENERATION:
+    # Remediation loops still go back to "questions" for fresh MCQs
+    workflow.add_node("study_material", study_material_node)
+    workflow.add_edge("process", "study_material")
+    workflow.add_edge("study_material", "verify")
+else:
+    workflow.add_node("summarize", summarize_node)
+    workflow.add_edge("process", "summarize")
+    workflow.add_edge("summarize", "questions")
 workflow.add_edge("questions", "verify")
 
 workflow.add_conditional_edges(
@@ -254,24 +351,77 @@ workflow.add_conditional_edges(
 
 workflow.add_edge("remedial", "questions")
 
-# Setup Checkpointer
-connection_string = os.getenv("DATABASE_URL")
-if connection_string and "postgresql" in connection_string:
-    try:
-        # LangGraph PostgresSaver uses psycopg pool (lazy import to avoid crash without postgres)
-        from langgraph.checkpoint.postgres import PostgresSaver
-        from psycopg_pool import ConnectionPool
-        pool = ConnectionPool(conninfo=connection_string, max_size=20)
-        checkpointer = PostgresSaver(pool)
-        # Note: In a production app, you'd call checkpointer.setup() in a startup hook
-        app = workflow.compile(checkpointer=checkpointer)
-        print("✅ LangGraph using PostgreSQL checkpointer.")
-    except Exception as e:
-        print(f"⚠️  Failed to connect to Postgres for LangGraph: {e}. Falling back to in-memory.")
-        app = workflow.compile()
-else:
+# Study-material phase only (start -> summarize), used by the streaming API via astream.
+# It uses the async node variants so a stream holds no thread while waiting on
+# search or the LLM (sync nodes run in LangGraph's executor), and stops once the
+# summary is ready instead of continuing into the interactive quiz loop.
+study_workflow = StateGraph(AgentState)
+study_workflow.add_node("start", start_checkpoint)
+study_workflow.add_node("gather", agather_context_node)
+study_workflow.add_node("validate", avalidate_context_node)
+study_workflow.add_node("process", process_context_node)
+study_workflow.add_node("summarize", asummarize_node)
+
+study_workflow.set_entry_point("start")
+study_workflow.add_edge("start", "gather")
+study_workflow.add_edge("gather", "validate")
+study_workflow.add_conditional_edges(
+    "validate",
+    decide_to_continue,
+    {
+        "process": "process",
+        "retry": "gather",
+        "end": END
+    }
+)
+study_workflow.add_edge("process", "summarize")
+study_workflow.add_edge("summarize", END)
+
+# Compiled graphs are built on first use so importing this module stays cheap
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def _compile_app():
+    connection_string = os.getenv("DATABASE_URL")
+    if connection_string and "postgresql" in connection_string:
+        try:
+            # LangGraph PostgresSaver uses psycopg pool (lazy import to avoid crash without postgres)
+            from langgraph.checkpoint.postgres import PostgresSaver
+            from psycopg_pool import ConnectionPool
+            pool = ConnectionPool(conninfo=connection_string, max_size=20)
+            checkpointer = PostgresSaver(pool)
+            # Note: In a production app, you'd call checkpointer.setup() in a startup hook
+            compiled = workflow.compile(checkpointer=checkpointer)
+            print("✅ LangGraph using PostgreSQL checkpointer.")
+            return compiled
+        except Exception as e:
+            print(f"⚠️  Failed to connect to Postgres for LangGraph: {e}. Falling back to in-memory.")
+            return workflow.compile()
     print("ℹ️  LangGraph using in-memory checkpointer (no Postgres detected).")
-    app = workflow.compile()
+    return workflow.compile()
+
+def _get_graph(name: str, build):
+    if name not in _graphs:
+        with _graphs_lock:
+            if name not in _graphs:
+                _graphs[name] = build()
+    return _graphs[name]
+
+def get_app():
+    """Returns the full learning graph, compiling it (and its checkpointer) on first use."""
+    return _get_graph("app", _compile_app)
+
+def get_study_app():
+    """Returns the study-phase graph, compiling it on first use."""
+    return _get_graph("study_app", study_workflow.compile)
+
+def __getattr__(name: str):
+    # Keeps `from agent import app` working for scripts without compiling at import time
+    if name == "app":
+        return get_app()
+    if name == "study_app":
+        return get_study_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # Define initial state
@@ -303,12 +453,12 @@ if __name__ == "__main__":
     current_state = state
     print("--- Running Knowledge Engine ---", flush=True)
     
-    for output in app.stream(current_state):
+    for output in get_app().stream(current_state):
         for key, value in output.items():
             print(f"--- Node '{key}' completed ---", flush=True)
             current_state.update(value)
             
-            if key == "summarize":
+            if key in ("summarize", "study_material"):
                 print("\n" + "="*50, flush=True)
                 print("      --- STUDY MATERIAL ---      ", flush=True)
                 print("="*50, flush=True)
@@ -402,7 +402,7 @@ elif st.session_state.step == "remediation":
                 mcq = mcqs[idx]
                 st.write(f"Refining: *{mcq.question}*...")
                 simple_context = search_for_simple_explanation(mcq.question)
-                explanation = generate_feynman_explanation(mcq.question, state["checkpoint"].context, simple_context)
+                explanation = generate_feynman_explanation(mcq.question, state["checkpoint"].context, simple_context, context_key=state.get("context_hash"))
                 st.session_state.feynman_explanations[idx] = explanation
             status.update(label="All explanations ready!", state="complete", expanded=False)
             st.rerun()
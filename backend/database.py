@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, JSON, ForeignKey, DateTime
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, Text, JSON, ForeignKey, DateTime, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import datetime
@@ -55,6 +55,10 @@ class MasterySession(Base):
     relevance_score = Column(Float, default=0.0)
     score = Column(Float, default=0.0)
     missed_indices = Column(JSON, nullable=True)  # List of indices of missed MCQs
+    topic_embedding = Column(LargeBinary, nullable=True)  # float32 bytes of the (topic, objectives) embedding
+    context_hash = Column(String(64), nullable=True, index=True)  # Key of the context's chunk artifact
+    quiz_status = Column(String, nullable=True)  # None, "generating" or "ready"; guards against generating the quiz twice
+    quiz_claimed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc), onupdate=lambda: datetime.datetime.now(datetime.timezone.utc))
 
@@ -71,11 +75,42 @@ class Question(Base):
     question = Column(Text)
     options = Column(JSON) # List of strings
     correct_index = Column(Integer)
+    explanation = Column(Text, nullable=True)  # Feynman explanation, generated once when the question is missed
 
     session = relationship("MasterySession", back_populates="mcqs")
 
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True, index=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    kind = Column(String, default="learning")
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    stage = Column(String, nullable=True)
+    owner = Column(String, nullable=True)  # "host:pid:boot id" of the process running the job
+    payload = Column(JSON)  # Inputs needed to (re)run the job
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    session_id = Column(Integer, ForeignKey("mastery_sessions.id"), nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc), onupdate=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+def _add_missing_columns():
+    """create_all() never alters existing tables, so add any newly declared nullable columns in place."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,209 @@
+"""
+jobs.py - Background execution of long-running learning pipelines.
+
+/start only records a Job row and returns its id; a bounded worker pool runs
+the pipeline and writes the stage, result or error back to the database.
+Because job state lives in the database, queued or interrupted jobs are
+picked up again when the server restarts. Each claim records its owner
+process, and a periodic sweep re-queues running jobs whose owner is gone,
+so work interrupted in any worker is resumed without waiting for a timeout.
+"""
+import datetime
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from dotenv import load_dotenv
+
+from backend.database import SessionLocal, Job
+from backend.pipeline import run_learning_pipeline, TopicNotRelevantError
+
+load_dotenv()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# A "running" job untouched for this long is assumed to belong to a dead process
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="learning-job")
+
+
+_HOST = socket.gethostname()
+_boot_id = uuid.uuid4().hex[:8]
+
+
+def _new_boot_id() -> None:
+    # A forked worker is a different owner from its parent even before it has a new pid in the rows
+    global _boot_id
+    _boot_id = uuid.uuid4().hex[:8]
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_boot_id)
+
+
+def current_owner() -> str:
+    return f"{_HOST}:{os.getpid()}:{_boot_id}"
+
+
+def owner_is_gone(owner: str) -> bool:
+    """
+    True when `owner` names a process on this host that no longer exists (or a
+    previous boot of this very process). Owners on other hosts cannot be
+    checked, so they only expire through JOB_STALE_SECONDS.
+    """
+    try:
+        host, pid, boot_id = owner.rsplit(":", 2)
+        pid = int(pid)
+    except ValueError:
+        return False
+    if host != _HOST:
+        return False
+    if pid == os.getpid():
+        return boot_id != _boot_id
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+def describe(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "session_id": job.session_id,
+        "error": job.error,
+        "created_at": _as_utc(job.created_at),
+        "updated_at": _as_utc(job.updated_at)
+    }
+
+
+def submit_learning_job(db, user_id: int, topic: str, objectives: List[str]) -> Job:
+    """Persists a queued job and hands it to the worker pool."""
+    job = Job(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        kind="learning",
+        status=QUEUED,
+        payload={"topic": topic, "objectives": objectives}
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _executor.submit(_run_job, job.id)
+    return job
+
+
+def _claim(db, job_id: str) -> bool:
+    """Atomically moves a job from queued to running so only one worker executes it."""
+    claimed = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.status == QUEUED)
+        .update({Job.status: RUNNING, Job.owner: current_owner(), Job.updated_at: _utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _run_job(job_id: str) -> None:
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.query(Job).filter(Job.id == job_id).first()
+
+        def on_stage(stage: str):
+            job.stage = stage
+            db.commit()
+
+        try:
+            result = run_learning_pipeline(db, job.payload["topic"], job.payload["objectives"], job.user_id, on_stage=on_stage)
+            job.result = result
+            job.session_id = result.get("session_id")
+            job.status = SUCCEEDED
+            job.stage = "done"
+        except TopicNotRelevantError as e:
+            db.rollback()
+            job.status = FAILED
+            job.error = str(e)
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            job.status = FAILED
+            job.error = f"Pipeline failed: {e}"
+        db.commit()
+    finally:
+        db.close()
+
+
+def _is_orphaned(job: Job, stale_before: datetime.datetime) -> bool:
+    if job.owner and owner_is_gone(job.owner):
+        return True
+    # Owners that cannot be checked (other hosts, rows from before owners were recorded) time out instead
+    return _as_utc(job.updated_at) <= stale_before
+
+
+def resume_pending_jobs(include_queued: bool = True) -> int:
+    """
+    Re-enqueues jobs running in a process that is gone and, unless
+    `include_queued` is False, jobs still waiting in the queue. Returns the count.
+    """
+    db = SessionLocal()
+    try:
+        stale_before = _utcnow() - datetime.timedelta(seconds=JOB_STALE_SECONDS)
+        statuses = [QUEUED, RUNNING] if include_queued else [RUNNING]
+        pending = db.query(Job).filter(Job.status.in_(statuses)).all()
+        resumed = []
+        for job in pending:
+            if job.status == RUNNING:
+                if not _is_orphaned(job, stale_before):
+                    continue
+                job.status = QUEUED
+                job.stage = None
+                job.owner = None
+            resumed.append(job.id)
+        db.commit()
+        for job_id in resumed:
+            _executor.submit(_run_job, job_id)
+        if resumed:
+            print(f"ℹ️  Resumed {len(resumed)} pending learning job(s).")
+        return len(resumed)
+    finally:
+        db.close()
+
+
+def start_sweeper(interval: float = JOB_SWEEP_INTERVAL) -> threading.Thread:
+    """Periodically re-queues running jobs orphaned by a worker that died after startup."""
+    def sweep():
+        while True:
+            time.sleep(interval)
+            try:
+                resume_pending_jobs(include_queued=False)
+            except Exception as e:
+                print(f"⚠️  Job sweep failed: {e}")
+
+    thread = threading.Thread(target=sweep, name="job-sweeper", daemon=True)
+    thread.start()
+    return thread
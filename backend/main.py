@@ -1,8 +1,11 @@
 import sys
 import os
 import datetime
+import json
+import asyncio
 from typing import List, Optional, Any
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -17,11 +20,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # So `import agent` works if we are in root.
 
 try:
-    from agent import app as agent_app, start_checkpoint, gather_context_node, validate_context_node, process_context_node, summarize_node, generate_questions_node, verify_understanding_node, remedial_node
-    from models import AgentState, Checkpoint, MCQ
-    from search_utils import search_for_simple_explanation
-    from context_utils import generate_feynman_explanation
-    from backend.database import init_db, get_db, MasterySession, Question, User
+    from agent import get_study_app, verify_understanding_node, remedial_node
+    from models import AgentState, MCQ
+    from remediation import aexplain_concepts
+    from search_utils import get_relevance_stats
+    import llm_cache
+    import search_cache
+    import vector_store_manager
+    import numpy_vector_store
+    import embedding_service
+    from context_utils import get_embedding_cache_stats
+    from backend.database import init_db, get_db, SessionLocal, MasterySession, Question, User, Job
+    from backend import quiz_prefetch, pipeline, jobs, warmup
     from sqlalchemy.orm import Session
     from fastapi import Depends, Security
     from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -38,6 +48,9 @@ app = FastAPI(title="Autonomous Learning Agent API", version="1.0.0")
 @app.on_event("startup")
 def startup_event():
     init_db()
+    warmup.preload_on_startup()
+    jobs.resume_pending_jobs()
+    jobs.start_sweeper()
 
 app.add_middleware(
     CORSMiddleware,
@@ -95,6 +108,27 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 def read_root():
     return {"status": "ok", "message": "Autonomous Learning Agent API is running"}
 
+@app.get("/stats")
+def get_stats(current_user: User = Depends(get_current_user)):
+    cache = llm_cache.get_cache()
+    return {
+        "llm_cache": cache.stats() if cache else None,
+        "relevance": get_relevance_stats(),
+        "search_cache": search_cache.cache.stats(),
+        "vector_store": vector_store_manager.get_stats(),
+        "numpy_vector_store": numpy_vector_store.get_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "embedding_service": embedding_service.get_stats()
+    }
+
+@app.post("/warmup")
+def run_warmup(components: Optional[List[str]] = Query(None), current_user: User = Depends(get_current_user)):
+    """Loads the embedding model, Chroma, search tool, graphs and LLM client now instead of on first use."""
+    try:
+        return {"status": "ok", "seconds": warmup.warmup(components)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/register", response_model=UserResponse)
 def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if username or email already exists
@@ -122,104 +156,116 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/start")
+@app.post("/start", status_code=202)
 def start_learning(req: InitRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    initial_checkpoint = Checkpoint(
-        topic=req.topic,
-        objectives=req.objectives,
-        success_criteria=[f"Complete assessment for {req.topic}"]
-    )
-    
-    state = {
-        "checkpoint": initial_checkpoint,
-        "gathered_info": [],
-        "is_relevant": False,
-        "relevance_score": 0.0,
-        "iterations": 0,
-        "messages": [],
-        "questions": [],
-        "mcqs": [],
-        "summary": "",
-        "answers": [],
-        "score": 0.0,
-        "missed_indices": [],
-        "is_streamlit": True,
-        "seen_questions": []
-    }
-    
-    # Run agent nodes
-    state.update(start_checkpoint(state))
-    state.update(gather_context_node(state))
-    state.update(validate_context_node(state))
-    
-    if not state["is_relevant"]:
-        raise HTTPException(status_code=400, detail="Topic not relevant or context not found")
-        
-    state.update(process_context_node(state))
-    state.update(summarize_node(state))
-    
-    # Persist to Database
-    db_session = MasterySession(
-        topic=req.topic,
-        objectives=req.objectives,
-        context=state["checkpoint"].context,
-        summary=state["summary"],
-        relevance_score=state["relevance_score"],
-        user_id=current_user.id
-    )
-    db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    
+    """Queues the learning pipeline and returns a job id to poll."""
+    job = jobs.submit_learning_job(db, current_user.id, req.topic, req.objectives)
     return {
-        "message": "Learning started",
-        "session_id": db_session.id,
-        "summary": state["summary"],
-        "relevance_score": state["relevance_score"]
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
     }
 
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.describe(job)
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, response: Response, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == jobs.FAILED:
+        raise HTTPException(status_code=400, detail=job.error or "Job failed")
+    if job.status != jobs.SUCCEEDED:
+        # Not finished yet: keep polling
+        response.status_code = 202
+        return jobs.describe(job)
+    return job.result
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/start/stream")
+def start_learning_stream(topic: str, objectives: List[str] = Query(...), current_user: User = Depends(get_current_user)):
+    """
+    Server-sent-events variant of /start. Emits a `node` event as each stage
+    finishes, `token` events while the summary is generated, then `done`
+    with the persisted session (or `error`).
+    """
+    user_id = current_user.id
+
+    async def event_stream():
+        # The request-scoped session is closed once the response starts, so the stream owns its own.
+        # Database and embedding work runs in threads; the graph itself runs on the event loop.
+        db = SessionLocal()
+        try:
+            topic_vector, cached_response = await asyncio.to_thread(pipeline.reuse_similar_session, db, topic, objectives, user_id)
+            if cached_response:
+                yield _sse("done", cached_response)
+                return
+            
+            state = pipeline.initial_state(topic, objectives)
+            async for mode, chunk in get_study_app().astream(state, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "summarize" and message.content:
+                        yield _sse("token", {"text": message.content})
+                    continue
+                for node, update in chunk.items():
+                    update = update or {}
+                    state.update(update)
+                    messages = update.get("messages") or [""]
+                    yield _sse("node", {"node": node, "message": messages[-1]})
+            
+            if not state["is_relevant"] or not state["summary"]:
+                yield _sse("error", {"detail": "Topic not relevant or context not found"})
+                return
+            
+            db_session = await asyncio.to_thread(pipeline.persist_session, db, topic, objectives, state["checkpoint"].context, state["summary"], state["relevance_score"], topic_vector, user_id, state.get("context_hash"))
+            quiz_prefetch.schedule(db_session.id)
+            yield _sse("done", {
+                "message": "Learning started",
+                "session_id": db_session.id,
+                "summary": state["summary"],
+                "relevance_score": state["relevance_score"],
+                "cache_hit": False
+            })
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            db.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/quiz")
-def get_quiz(session_id: Optional[int] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if session_id:
-        db_session = db.query(MasterySession).filter(MasterySession.id == session_id, MasterySession.user_id == current_user.id).first()
-    else:
-        db_session = db.query(MasterySession).filter(MasterySession.user_id == current_user.id).order_by(MasterySession.created_at.desc()).first()
-        
+async def get_quiz(session_id: Optional[int] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    # Database calls are blocking, so this async handler runs each of them in a worker thread
+    db_session = await asyncio.to_thread(_find_session, db, session_id, current_user.id)
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # If MCQs already generated, return them
-    if not db_session.mcqs:
-        # Reconstruct state to run agent node
-        state = {
-            "checkpoint": Checkpoint(
-                topic=db_session.topic,
-                objectives=db_session.objectives,
-                context=db_session.context,
-                success_criteria=[]
-            ),
-            "mcqs": [],
-            "seen_questions": [],
-            "messages": []
-        }
-        state.update(generate_questions_node(state))
-        
-        # Save MCQs to DB
-        for mcq in state["mcqs"]:
-            db_question = Question(
-                session_id=db_session.id,
-                question=mcq.question,
-                options=mcq.options,
-                correct_index=mcq.correct_index
-            )
-            db.add(db_question)
-        db.commit()
-        db.refresh(db_session)
+    # Questions are usually prefetched right after /start; this waits for whichever
+    # worker claimed the generation, or generates them here if nobody has
+    if not await quiz_prefetch.aensure_questions(db, db_session):
+        raise HTTPException(status_code=503, detail="Quiz is still being generated, please retry shortly")
+    questions = await asyncio.to_thread(_refreshed_questions, db, db_session)
         
-    return {
-        "session_id": db_session.id,
-        "questions": [{"id": q.id, "question": q.question, "options": q.options} for q in db_session.mcqs]
-    }
+    return {"session_id": db_session.id, "questions": questions}
+
+def _find_session(db: Session, session_id: Optional[int], user_id: int) -> Optional[MasterySession]:
+    """The user's session with this id, or their latest one when no id is given."""
+    if session_id:
+        return db.query(MasterySession).filter(MasterySession.id == session_id, MasterySession.user_id == user_id).first()
+    return db.query(MasterySession).filter(MasterySession.user_id == user_id).order_by(MasterySession.created_at.desc()).first()
+
+def _refreshed_questions(db: Session, db_session: MasterySession) -> List[dict]:
+    db.refresh(db_session)
+    return [{"id": q.id, "question": q.question, "options": q.options} for q in db_session.mcqs]
 
 @app.post("/submit")
 def submit_quiz(req: AnswerRequest, session_id: Optional[int] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -257,36 +303,45 @@ def submit_quiz(req: AnswerRequest, session_id: Optional[int] = None, db: Sessio
     }
 
 @app.get("/remediation")
-def get_remediation(session_id: Optional[int] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    if session_id:
-        db_session = db.query(MasterySession).filter(MasterySession.id == session_id, MasterySession.user_id == current_user.id).first()
-    else:
-        db_session = db.query(MasterySession).filter(MasterySession.user_id == current_user.id).order_by(MasterySession.created_at.desc()).first()
-        
+async def get_remediation(session_id: Optional[int] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    db_session = await asyncio.to_thread(_find_session, db, session_id, current_user.id)
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
         
-    # In a real app, we might store missed_indices, 
-    # but for now we can infer them or just return all if score < 70
-    # Actually, the original API returned them based on global_state.
-    # Let's just return all for simplicity or recalculate (the submit endpoint should ideally store them)
-    
-    # Recalculate missed indices if we don't store them 
-    # (To be precise, the front-end might want to know WHICH ones were missed)
-    # The submit endpoint returns missed_indices, maybe the frontend keeps track.
+    if db_session.missed_indices is None:
+        raise HTTPException(status_code=400, detail="Quiz not submitted yet")
+
+    session_id = db_session.id
+    missed, pending, context, context_key = await asyncio.to_thread(_missed_questions, db_session)
+    if pending:
+        texts = await aexplain_concepts([q.question for q in pending], context, context_key=context_key)
+        await asyncio.to_thread(_store_explanations, db, pending, texts)
     
-    explanations = []
-    for q in db_session.mcqs:
-        # For simplicity in this demo, treat all as candidates or filtered by caller
-        simple_context = search_for_simple_explanation(q.question)
-        explanation = generate_feynman_explanation(q.question, db_session.context, simple_context)
-        explanations.append({
+    # The commit expires the loaded rows, so reading them back may hit the database too
+    explanations = await asyncio.to_thread(_explanation_payload, missed)
+    return {"session_id": session_id, "remediation": explanations}
+
+def _missed_questions(db_session: MasterySession):
+    # Only the questions missed in the last submission need remediation
+    questions = list(db_session.mcqs)
+    missed = [questions[i] for i in db_session.missed_indices if 0 <= i < len(questions)]
+    # Explanations are persisted per question, so only generate the ones we have never produced
+    pending = [q for q in missed if not q.explanation]
+    return missed, pending, db_session.context, db_session.context_hash
+
+def _store_explanations(db: Session, pending: List[Question], texts: List[str]) -> None:
+    for q, explanation in zip(pending, texts):
+        q.explanation = explanation
+    db.commit()
+
+def _explanation_payload(missed: List[Question]) -> List[dict]:
+    return [
+        {
             "question": q.question,
-            "explanation": explanation,
+            "explanation": q.explanation,
             "correct_answer": q.options[q.correct_index]
-        })
-        
-    return {"session_id": db_session.id, "remediation": explanations}
+        } for q in missed
+    ]
 
 @app.post("/reset")
 def reset_state(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -294,6 +349,7 @@ def reset_state(db: Session = Depends(get_db), current_user: User = Depends(get_
     sessions = db.query(MasterySession).filter(MasterySession.user_id == current_user.id).all()
     for session in sessions:
         db.query(Question).filter(Question.session_id == session.id).delete()
+    db.query(Job).filter(Job.user_id == current_user.id).delete()
     db.query(MasterySession).filter(MasterySession.user_id == current_user.id).delete()
     db.commit()
     return {"message": "Database state cleared for user"}
@@ -327,7 +383,7 @@ def get_session_details(session_id: int, db: Session = Depends(get_db), current_
         "score": db_session.score,
         "relevance_score": db_session.relevance_score,
         "created_at": db_session.created_at.replace(tzinfo=datetime.timezone.utc) if db_session.created_at.tzinfo is None else db_session.created_at,
-        "mcqs": [{"question": q.question, "options": q.options, "correct_index": q.correct_index} for q in db_session.mcqs],
+        "mcqs": [{"question": q.question, "options": q.options, "correct_index": q.correct_index, "explanation": q.explanation} for q in db_session.mcqs],
         "missed_indices": db_session.missed_indices
     }
 
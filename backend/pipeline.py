@@ -0,0 +1,138 @@
+"""
+pipeline.py - The /start learning pipeline, shared by the job workers and the SSE endpoint.
+
+Runs gather -> validate -> process -> summarize for a topic, persists the
+resulting MasterySession and kicks off quiz prefetching.
+"""
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from agent import start_checkpoint, gather_context_node, validate_context_node, process_context_node, summarize_node, study_material_node, FUSED_GENERATION
+from models import Checkpoint
+from context_utils import context_hash
+from backend.database import MasterySession
+from backend import semantic_cache, quiz_prefetch
+
+
+class TopicNotRelevantError(Exception):
+    """Raised when no relevant context could be gathered for the topic."""
+
+
+def initial_state(topic: str, objectives: List[str]) -> dict:
+    return {
+        "checkpoint": Checkpoint(
+            topic=topic,
+            objectives=objectives,
+            success_criteria=[f"Complete assessment for {topic}"]
+        ),
+        "gathered_info": [],
+        "context_hash": None,
+        "is_relevant": False,
+        "relevance_score": 0.0,
+        "iterations": 0,
+        "messages": [],
+        "questions": [],
+        "mcqs": [],
+        "summary": "",
+        "answers": [],
+        "score": 0.0,
+        "missed_indices": [],
+        "is_streamlit": True,
+        "seen_questions": []
+    }
+
+def reuse_similar_session(db: Session, topic: str, objectives: List[str], user_id: int):
+    """
+    Looks up a prior session with a semantically equivalent topic.
+    Returns (topic_vector, response); response is None on a cache miss.
+    """
+    if not semantic_cache.SEMANTIC_CACHE_ENABLED:
+        return None, None
+    topic_vector = semantic_cache.embed_topic(topic, objectives)
+    source, similarity = semantic_cache.lookup(db, topic_vector)
+    if source is None:
+        return topic_vector, None
+    
+    print(f"--- Semantic cache hit: reusing session {source.id} (similarity {similarity:.3f}) ---")
+    db_session = persist_session(db, topic, objectives, source.context, source.summary, source.relevance_score, topic_vector, user_id, source.context_hash)
+    quiz_prefetch.schedule(db_session.id)
+    return topic_vector, {
+        "message": "Learning started",
+        "session_id": db_session.id,
+        "summary": db_session.summary,
+        "relevance_score": db_session.relevance_score,
+        "cache_hit": True,
+        "cached_from_session_id": source.id,
+        "similarity": similarity
+    }
+
+def persist_session(db: Session, topic: str, objectives: List[str], context: str, summary: str, relevance_score: float, topic_vector, user_id: int, context_key: Optional[str] = None) -> MasterySession:
+    db_session = MasterySession(
+        topic=topic,
+        objectives=objectives,
+        context=context,
+        context_hash=context_key or (context_hash(context) if context else None),
+        summary=summary,
+        relevance_score=relevance_score,
+        topic_embedding=topic_vector.tobytes() if topic_vector is not None else None,
+        user_id=user_id
+    )
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    if topic_vector is not None:
+        semantic_cache.remember(db, db_session.id, topic_vector)
+    return db_session
+
+def run_learning_pipeline(db: Session, topic: str, objectives: List[str], user_id: int, on_stage: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Runs the study-material pipeline and returns the /start response payload.
+    `on_stage` is called with each stage name as it begins.
+    """
+    def stage(name: str):
+        if on_stage:
+            on_stage(name)
+
+    stage("cache_lookup")
+    topic_vector, cached_response = reuse_similar_session(db, topic, objectives, user_id)
+    if cached_response:
+        return cached_response
+
+    state = initial_state(topic, objectives)
+    
+    # Run agent nodes
+    state.update(start_checkpoint(state))
+    stage("gather")
+    state.update(gather_context_node(state))
+    stage("validate")
+    state.update(validate_context_node(state))
+    
+    if not state["is_relevant"]:
+        raise TopicNotRelevantError("Topic not relevant or context not found")
+        
+    stage("process")
+    state.update(process_context_node(state))
+    stage("summarize")
+    if FUSED_GENERATION:
+        state.update(study_material_node(state))
+    else:
+        state.update(summarize_node(state))
+    
+    # Persist to Database
+    stage("persist")
+    db_session = persist_session(db, topic, objectives, state["checkpoint"].context, state["summary"], state["relevance_score"], topic_vector, user_id, state.get("context_hash"))
+    if state["mcqs"]:
+        # Fused generation already produced the quiz, so /quiz can serve it without another LLM call
+        quiz_prefetch.save_questions(db, db_session, state["mcqs"])
+    else:
+        # The client asks for the quiz next, so start generating it now
+        quiz_prefetch.schedule(db_session.id)
+    
+    return {
+        "message": "Learning started",
+        "session_id": db_session.id,
+        "summary": state["summary"],
+        "relevance_score": state["relevance_score"],
+        "cache_hit": False
+    }
@@ -0,0 +1,197 @@
+"""
+quiz_prefetch.py - Speculative MCQ generation right after /start.
+
+The frontend always asks for the quiz immediately after the study material,
+so /start schedules question generation in the background as soon as the
+summary is persisted. /quiz then returns the stored questions, or waits on
+the in-flight job if it has not finished yet.
+
+Whoever generates a session's questions first claims them with an atomic
+update of MasterySession.quiz_status, so a slow prefetch, a retried /quiz or
+another worker process never produces a second set; the losers wait for the
+claim holder to store its questions instead.
+"""
+import os
+import asyncio
+import datetime
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_
+
+from agent import generate_questions_node, agenerate_questions_node
+from models import Checkpoint, MCQ
+from backend.database import SessionLocal, MasterySession, Question
+
+load_dotenv()
+
+QUIZ_PREFETCH_ENABLED = os.getenv("QUIZ_PREFETCH_ENABLED", "1") == "1"
+QUIZ_PREFETCH_WORKERS = int(os.getenv("QUIZ_PREFETCH_WORKERS", "4"))
+QUIZ_WAIT_TIMEOUT = float(os.getenv("QUIZ_WAIT_TIMEOUT", "120"))
+# A "generating" claim older than this is assumed to belong to a dead process
+QUIZ_CLAIM_STALE_SECONDS = float(os.getenv("QUIZ_CLAIM_STALE_SECONDS", "300"))
+QUIZ_POLL_INTERVAL = float(os.getenv("QUIZ_POLL_INTERVAL", "0.5"))
+
+GENERATING = "generating"
+READY = "ready"
+
+_executor = ThreadPoolExecutor(max_workers=QUIZ_PREFETCH_WORKERS, thread_name_prefix="quiz-prefetch")
+_in_flight: Dict[int, Future] = {}
+_lock = threading.Lock()
+
+
+def _utcnow() -> datetime.datetime:
+    # Naive UTC, so the value compares the same way in SQLite and Postgres
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def claim_generation(db, session_id: int) -> bool:
+    """
+    Atomically marks the session's quiz as being generated. Returns False when
+    the session already has questions or another live worker holds the claim.
+    """
+    stale_before = _utcnow() - datetime.timedelta(seconds=QUIZ_CLAIM_STALE_SECONDS)
+    claimed = (
+        db.query(MasterySession)
+        .filter(
+            MasterySession.id == session_id,
+            ~MasterySession.mcqs.any(),
+            or_(
+                MasterySession.quiz_status.is_(None),
+                and_(MasterySession.quiz_status == GENERATING, MasterySession.quiz_claimed_at < stale_before)
+            )
+        )
+        .update({MasterySession.quiz_status: GENERATING, MasterySession.quiz_claimed_at: _utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def release_claim(db, session_id: int) -> None:
+    """Gives up a claim after a failed generation so the next request can retry at once."""
+    db.rollback()
+    (
+        db.query(MasterySession)
+        .filter(MasterySession.id == session_id, MasterySession.quiz_status == GENERATING)
+        .update({MasterySession.quiz_status: None, MasterySession.quiz_claimed_at: None}, synchronize_session=False)
+    )
+    db.commit()
+
+
+def save_questions(db, db_session: MasterySession, mcqs: List[MCQ]) -> None:
+    for mcq in mcqs:
+        db_question = Question(
+            session_id=db_session.id,
+            question=mcq.question,
+            options=mcq.options,
+            correct_index=mcq.correct_index
+        )
+        db.add(db_question)
+    db_session.quiz_status = READY
+    db.commit()
+    db.refresh(db_session)
+
+
+def _quiz_ready(db, db_session: MasterySession) -> bool:
+    db.refresh(db_session)
+    return db_session.quiz_status == READY or bool(db_session.mcqs)
+
+
+def _question_state(db_session: MasterySession) -> dict:
+    return {
+        "checkpoint": Checkpoint(
+            topic=db_session.topic,
+            objectives=db_session.objectives,
+            context=db_session.context,
+            success_criteria=[]
+        ),
+        "context_hash": db_session.context_hash,
+        "mcqs": [],
+        "seen_questions": [],
+        "messages": []
+    }
+
+
+def generate_and_store(db, db_session: MasterySession) -> None:
+    """Runs the question node for a persisted session and saves its MCQs."""
+    state = _question_state(db_session)
+    state.update(generate_questions_node(state))
+    save_questions(db, db_session, state["mcqs"])
+
+
+async def agenerate_and_store(db, db_session: MasterySession) -> None:
+    """Async variant of generate_and_store."""
+    state = _question_state(db_session)
+    state.update(await agenerate_questions_node(state))
+    await asyncio.to_thread(save_questions, db, db_session, state["mcqs"])
+
+
+def _prefetch(session_id: int) -> None:
+    db = SessionLocal()
+    try:
+        if not claim_generation(db, session_id):
+            return
+        db_session = db.query(MasterySession).filter(MasterySession.id == session_id).first()
+        try:
+            generate_and_store(db, db_session)
+        except Exception:
+            release_claim(db, session_id)
+            raise
+        print(f"--- Prefetched quiz for session {session_id} ---")
+    finally:
+        db.close()
+
+
+def schedule(session_id: int) -> None:
+    """Starts background MCQ generation for a session (no-op if already scheduled)."""
+    if not QUIZ_PREFETCH_ENABLED:
+        return
+    with _lock:
+        if session_id in _in_flight:
+            return
+        future = _executor.submit(_prefetch, session_id)
+        _in_flight[session_id] = future
+    future.add_done_callback(lambda _: _discard(session_id))
+
+
+def _discard(session_id: int) -> None:
+    with _lock:
+        _in_flight.pop(session_id, None)
+
+
+async def await_prefetch(session_id: int, timeout: float = QUIZ_WAIT_TIMEOUT) -> None:
+    """Waits, without blocking the event loop, for an in-flight prefetch of this session; failures are logged, not raised."""
+    with _lock:
+        future = _in_flight.get(session_id)
+    if future is None:
+        return
+    try:
+        await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except Exception as e:
+        print(f"⚠️  Quiz prefetch for session {session_id} failed: {e}. Generating on demand.")
+
+
+async def aensure_questions(db, db_session: MasterySession, timeout: float = QUIZ_WAIT_TIMEOUT) -> bool:
+    """
+    Makes sure the session has its questions: waits for a local prefetch,
+    generates them if nobody holds the claim, and otherwise polls until the
+    claim holder has stored them. Returns False if that takes over `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    await await_prefetch(db_session.id, timeout)
+    while True:
+        if await asyncio.to_thread(_quiz_ready, db, db_session):
+            return True
+        if await asyncio.to_thread(claim_generation, db, db_session.id):
+            try:
+                await agenerate_and_store(db, db_session)
+            except Exception:
+                await asyncio.to_thread(release_claim, db, db_session.id)
+                raise
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(QUIZ_POLL_INTERVAL)
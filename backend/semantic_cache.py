@@ -0,0 +1,157 @@
+"""
+semantic_cache.py - Reuses study material across differently worded topics.
+
+Each MasterySession stores the MiniLM embedding of its (topic, objectives).
+New /start requests are embedded the same way and matched against an
+in-memory matrix of those vectors; a match above the cosine threshold reuses
+the stored context, relevance score and summary instead of re-running the
+gather -> validate -> summarize pipeline.
+
+Other worker processes persist sessions too, so a lookup that finds no match
+first pulls in any rows newer than the last one this process loaded.
+"""
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+
+
+def topic_text(topic: str, objectives: List[str]) -> str:
+    return f"{topic.strip()}: {', '.join(o.strip() for o in objectives)}"
+
+
+def embed_topic(topic: str, objectives: List[str]) -> np.ndarray:
+    """Returns the unit-normalized float32 embedding of a (topic, objectives) pair."""
+    from context_utils import get_embeddings
+    vector = np.asarray(get_embeddings().embed_query(topic_text(topic, objectives)), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticTopicIndex:
+    """
+    Contiguous float32 matrix of unit vectors plus a parallel session-id array.
+    A lookup is one matrix-vector product, which stays well under a millisecond
+    for tens of thousands of rows.
+    """
+
+    def __init__(self, dim: int = 384, capacity: int = 1024):
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._known = set()
+        self.max_loaded_id = 0  # Highest session id read from the database
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, session_id: int, vector: np.ndarray) -> None:
+        with self._lock:
+            if session_id in self._known:
+                return
+            self._known.add(session_id)
+            if self._size == len(self._ids):
+                self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                self._ids = np.concatenate([self._ids, np.zeros_like(self._ids)])
+            self._matrix[self._size] = vector
+            self._ids[self._size] = session_id
+            self._size += 1
+
+    def remove(self, session_id: int) -> None:
+        with self._lock:
+            self._known.discard(session_id)
+            keep = self._ids[:self._size] != session_id
+            kept = int(keep.sum())
+            self._matrix[:kept] = self._matrix[:self._size][keep]
+            self._ids[:kept] = self._ids[:self._size][keep]
+            self._size = kept
+
+    def search(self, vector: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Returns (session_id, cosine similarity) of the nearest stored topic."""
+        with self._lock:
+            if self._size == 0:
+                return None
+            scores = self._matrix[:self._size] @ vector
+            best = int(np.argmax(scores))
+            return int(self._ids[best]), float(scores[best])
+
+
+_index: Optional[SemanticTopicIndex] = None
+_index_lock = threading.Lock()
+
+
+def _stored_rows(db, after_id: int = 0):
+    from backend.database import MasterySession
+    return (
+        db.query(MasterySession.id, MasterySession.topic_embedding)
+        .filter(MasterySession.id > after_id, MasterySession.topic_embedding.isnot(None), MasterySession.summary.isnot(None))
+        .order_by(MasterySession.id)
+        .all()
+    )
+
+
+def _add_rows(index: SemanticTopicIndex, rows) -> None:
+    for row in rows:
+        # Rows this process already remembered are skipped by add()
+        index.add(row.id, np.frombuffer(row.topic_embedding, dtype=np.float32))
+    if rows:
+        index.max_loaded_id = max(index.max_loaded_id, rows[-1].id)
+
+
+def get_index(db) -> SemanticTopicIndex:
+    """Returns the process-wide index, loading stored embeddings from the database once."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                rows = _stored_rows(db)
+                dim = len(rows[0].topic_embedding) // 4 if rows else 384
+                index = SemanticTopicIndex(dim=dim, capacity=max(1024, len(rows)))
+                _add_rows(index, rows)
+                _index = index
+    return _index
+
+
+def refresh(db) -> int:
+    """Adds sessions persisted (by any process) since the last load. Returns how many rows were read."""
+    index = get_index(db)
+    with _index_lock:
+        rows = _stored_rows(db, index.max_loaded_id)
+        _add_rows(index, rows)
+    return len(rows)
+
+
+def lookup(db, vector: np.ndarray, threshold: float = SIMILARITY_THRESHOLD):
+    """
+    Returns (session, similarity) for the closest prior session above the
+    threshold, or (None, similarity) when there is no usable match.
+    """
+    from backend.database import MasterySession
+    index = get_index(db)
+    match = index.search(vector)
+    if (match is None or match[1] < threshold) and refresh(db):
+        # The match may be a session another worker created after this index was loaded
+        match = index.search(vector)
+    if match is None:
+        return None, 0.0
+    session_id, similarity = match
+    if similarity < threshold:
+        return None, similarity
+    source = db.query(MasterySession).filter(MasterySession.id == session_id).first()
+    if source is None or not source.summary:
+        index.remove(session_id)
+        return None, similarity
+    return source, similarity
+
+
+def remember(db, session_id: int, vector: np.ndarray) -> None:
+    """Adds a freshly persisted session to the index."""
+    get_index(db).add(session_id, vector)
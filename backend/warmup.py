@@ -0,0 +1,87 @@
+"""
+warmup.py - Loads the heavy, lazily created objects ahead of the first request.
+
+Importing the API no longer loads torch, the embedding model, Chroma, the
+DuckDuckGo tool or the compiled LangGraph graphs; each is built on first
+use. `warmup()` builds them on demand (the /warmup endpoint) or at startup
+(PRELOAD_MODELS=1 blocks startup until done, PRELOAD_MODELS=background runs
+it in a thread while the server already accepts requests).
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0").lower()  # "0", "1" or "background"
+
+
+def _embeddings() -> None:
+    from context_utils import get_embeddings
+    # One real call so lazily initialized runtime state (threads, kernels) is ready too
+    get_embeddings().embed_query("warmup")
+
+
+def _vector_store() -> None:
+    from context_utils import VECTOR_STORE_BACKEND
+    if VECTOR_STORE_BACKEND == "chroma":
+        from vector_store_manager import get_manager
+        get_manager()
+
+
+def _search() -> None:
+    from search_utils import get_search
+    get_search()
+
+
+def _graphs() -> None:
+    from agent import get_app, get_study_app
+    get_app()
+    get_study_app()
+
+
+def _llm() -> None:
+    from llm_gateway import get_llm
+    get_llm()
+
+
+COMPONENTS: Dict[str, Callable[[], None]] = {
+    "embeddings": _embeddings,
+    "vector_store": _vector_store,
+    "search": _search,
+    "graphs": _graphs,
+    "llm": _llm,
+}
+
+
+def warmup(components: Optional[List[str]] = None) -> Dict[str, float]:
+    """Loads the given components (all by default) and returns seconds spent on each."""
+    timings = {}
+    for name in components or list(COMPONENTS):
+        if name not in COMPONENTS:
+            raise ValueError(f"Unknown warmup component '{name}'")
+        start = time.perf_counter()
+        COMPONENTS[name]()
+        timings[name] = round(time.perf_counter() - start, 3)
+    print(f"--- Warm-up done: {timings} ---")
+    return timings
+
+
+def preload_on_startup() -> None:
+    """Applies PRELOAD_MODELS; failures are logged so the server still starts."""
+    if PRELOAD_MODELS not in ("1", "background"):
+        return
+
+    def run():
+        try:
+            warmup()
+        except Exception as e:
+            print(f"⚠️  Warm-up failed: {e}. Components will load on first use.")
+
+    if PRELOAD_MODELS == "background":
+        threading.Thread(target=run, name="warmup", daemon=True).start()
+    else:
+        run()
@@ -0,0 +1,47 @@
+"""
+concurrency.py - Bounded, order-preserving fan-out for blocking I/O calls.
+
+Synchronous calls are spread over a thread pool, and coroutines are gathered
+on the event loop; both cap how many are in flight at once.
+"""
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "8"))
+
+
+def bounded_map(fn: Callable[[T], R], items: Iterable[T], max_in_flight: Optional[int] = None) -> List[R]:
+    """
+    Applies `fn` to every item concurrently with at most `max_in_flight` calls
+    running at once. Results come back in input order; the first exception is
+    re-raised once all calls have settled.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(max_in_flight or MAX_IN_FLIGHT, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, items))
+
+
+async def abounded_map(fn: Callable[[T], Awaitable[R]], items: Iterable[T], max_in_flight: Optional[int] = None) -> List[R]:
+    """Async counterpart of `bounded_map`: awaits `fn(item)` for every item under a semaphore."""
+    items = list(items)
+    semaphore = asyncio.Semaphore(max(1, max_in_flight or MAX_IN_FLIGHT))
+
+    async def limited(item: T) -> R:
+        async with semaphore:
+            return await fn(item)
+
+    return list(await asyncio.gather(*(limited(item) for item in items)))
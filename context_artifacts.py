@@ -0,0 +1,123 @@
+"""
+context_artifacts.py - Content-addressed chunk artifacts for gathered contexts.
+
+process_context_node splits the context once and stores the result under the
+context's SHA-256: the chunks, their (start, end) character offsets in the
+context and, when retrieval will need them, the chunk embeddings for the
+current backend. The hash is kept in the agent state and on MasterySession,
+and every later consumer (quiz generation, evaluation, remediation) loads the
+artifact instead of re-chunking and re-embedding the raw context.
+
+Artifacts never change once written, so they are safe to share between
+processes; a small in-process LRU avoids re-reading hot ones from disk.
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTEXT_ARTIFACT_DIR = os.getenv("CONTEXT_ARTIFACT_DIR", "./context_artifacts")
+MAX_CACHED_ARTIFACTS = int(os.getenv("MAX_CACHED_ARTIFACTS", "64"))
+
+
+class ContextArtifact:
+    """Chunks of one context, their offsets and (optionally) their embeddings."""
+
+    def __init__(self, context_hash: str, chunks: List[str], offsets: List[Tuple[int, int]], embeddings: Optional[np.ndarray] = None):
+        self.context_hash = context_hash
+        self.chunks = chunks
+        self.offsets = offsets
+        self.embeddings = embeddings
+
+
+def chunk_offsets(context: str, chunks: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) of each chunk in `context`, or (-1, -1) if the splitter altered it."""
+    offsets, cursor = [], 0
+    for chunk in chunks:
+        start = context.find(chunk, cursor)
+        if start < 0:
+            start = context.find(chunk)
+        if start < 0:
+            offsets.append((-1, -1))
+            continue
+        offsets.append((start, start + len(chunk)))
+        cursor = start + 1  # Chunks overlap, so the next one may start before this one ends
+    return offsets
+
+
+_artifacts: "OrderedDict[str, ContextArtifact]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _paths(key: str) -> Tuple[str, str]:
+    from embedding_backends import EMBEDDING_BACKEND
+    base = os.path.join(CONTEXT_ARTIFACT_DIR, key[:2], key)
+    # Embeddings are only valid for the backend that produced them
+    return f"{base}.json", f"{base}.{EMBEDDING_BACKEND}.npy"
+
+
+def _write_atomic(path: str, write) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _remember(artifact: ContextArtifact) -> ContextArtifact:
+    with _lock:
+        _artifacts[artifact.context_hash] = artifact
+        _artifacts.move_to_end(artifact.context_hash)
+        while len(_artifacts) > MAX_CACHED_ARTIFACTS:
+            _artifacts.popitem(last=False)
+    return artifact
+
+
+def load_artifact(key: str) -> Optional[ContextArtifact]:
+    """Returns the stored artifact for a context hash, or None if it was never built."""
+    with _lock:
+        artifact = _artifacts.get(key)
+        if artifact is not None:
+            _artifacts.move_to_end(key)
+            return artifact
+    json_path, npy_path = _paths(key)
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    embeddings = np.load(npy_path) if os.path.exists(npy_path) else None
+    return _remember(ContextArtifact(key, data["chunks"], [tuple(o) for o in data["offsets"]], embeddings))
+
+
+def get_artifact(context: str, with_embeddings: bool = False, key: Optional[str] = None) -> ContextArtifact:
+    """
+    Loads the artifact for this context, building and storing it on first use.
+    `key` is the context's hash when the caller already has it (e.g. persisted
+    on the session), which skips re-hashing the context.
+    With `with_embeddings`, chunk embeddings are computed and stored if missing.
+    """
+    from context_utils import chunk_and_embed, context_hash, get_embeddings
+    key = key or context_hash(context)
+    artifact = load_artifact(key)
+    if artifact is None:
+        # Splitting runs in the embedding service's workers when it is enabled; vectors only when asked for
+        chunks, vectors = chunk_and_embed(context, with_embeddings)
+        artifact = ContextArtifact(key, chunks, chunk_offsets(context, chunks))
+        json_path, npy_path = _paths(key)
+        payload = json.dumps({"chunks": artifact.chunks, "offsets": artifact.offsets}).encode("utf-8")
+        _write_atomic(json_path, lambda f: f.write(payload))
+        if vectors is not None:
+            _write_atomic(npy_path, lambda f: np.save(f, vectors))
+            artifact.embeddings = vectors
+        _remember(artifact)
+    if with_embeddings and artifact.embeddings is None and artifact.chunks:
+        vectors = np.asarray(get_embeddings().embed_documents(artifact.chunks), dtype=np.float32)
+        _write_atomic(_paths(key)[1], lambda f: np.save(f, vectors))
+        artifact.embeddings = vectors
+    return artifact
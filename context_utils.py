@@ -1,16 +1,63 @@
 import os
-from typing import List
+import asyncio
+import hashlib
+import threading
+from typing import List, Optional, Tuple, Union
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from pydantic import BaseModel, Field
 from models import MCQ
+import llm_gateway
+from embedding_cache import CachedEmbeddings, EMBEDDING_CACHE_ENABLED
+from embedding_backends import load_embeddings, EMBEDDING_BACKEND
+from embedding_service import RemoteEmbeddings, EMBEDDING_SERVICE_ENABLED
+import embedding_service
+from dotenv import load_dotenv
 
-# Local embedding model
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+load_dotenv()
+
+# Retrieval mode: prompts get the top-k chunks for their question instead of the full context
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") == "1"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CHARS_PER_TOKEN = 4
+# Per-session index: "numpy" (in-process matrix) or "chroma" (persistent collections)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "numpy").lower()
+
+# Local embedding model on the selected backend, behind the on-disk embedding cache unless disabled.
+# Loaded on first use so importing this module does not pull in torch.
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    """Returns the shared embedding model, loading it on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                if EMBEDDING_SERVICE_ENABLED:
+                    # The model runs in the embedding service's worker processes instead
+                    model = RemoteEmbeddings()
+                else:
+                    model = load_embeddings(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+                if EMBEDDING_CACHE_ENABLED:
+                    model = CachedEmbeddings(model, namespace=f"{EMBEDDING_MODEL}-{EMBEDDING_BACKEND}")
+                _embeddings = model
+    return _embeddings
+
+def get_embedding_cache_stats() -> Optional[dict]:
+    """Embedding cache counters, or None if the model is not loaded or uncached."""
+    cache = getattr(_embeddings, "cache", None)
+    return cache.stats() if cache else None
+
+def __getattr__(name: str):
+    # Keeps `from context_utils import embeddings` working without an eager load
+    if name == "embeddings":
+        return get_embeddings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def chunk_text(text: str) -> List[str]:
     """Splits text into chunks for vectorization."""
@@ -21,90 +68,250 @@ def chunk_text(text: str) -> List[str]:
     )
     return text_splitter.split_text(text)
 
-def setup_vector_store(chunks: List[str]):
-    """Creates a temporary in-memory vector store."""
+def chunk_and_embed(text: str, with_embeddings: bool = True) -> Tuple[List[str], Optional[np.ndarray]]:
+    """
+    Splits `text` into chunks and, with `with_embeddings`, embeds them
+    (float32, one row per chunk). With the embedding service on, splitting
+    runs in one of its worker processes; embedding always goes through
+    get_embeddings(), so chunks hit the embedding cache and the service's
+    request batching.
+    """
+    chunks = embedding_service.chunk_document(text) if EMBEDDING_SERVICE_ENABLED else chunk_text(text)
+    if not with_embeddings or not chunks:
+        return chunks, None
+    return chunks, np.asarray(get_embeddings().embed_documents(chunks), dtype=np.float32)
+
+def setup_vector_store(chunks: List[str], collection_name: str = "temp_context", client=None):
+    """Creates a vector store; in memory unless a persistent Chroma `client` is given."""
+    from langchain_community.vectorstores import Chroma
     return Chroma.from_texts(
         texts=chunks,
-        embedding=embeddings,
-        collection_name="temp_context"
+        embedding=get_embeddings(),
+        collection_name=collection_name,
+        client=client
     )
 
-def generate_summary(context: str, topic: str) -> str:
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+def index_context(context: str, namespace: Optional[str] = None, context_key: Optional[str] = None):
+    """
+    Returns the vector store for this context, embedding it only the first time.
+    Stores are namespaced by content hash unless an explicit namespace (e.g. a
+    session id) is given, and by embedding backend so vectors from different
+    backends never share a store. `context_key` is the context's hash if known.
+    """
+    from context_artifacts import get_artifact
+    context_key = context_key or context_hash(context)
+    namespace = f"{EMBEDDING_BACKEND}_{namespace or context_key[:32]}"
+    if VECTOR_STORE_BACKEND == "chroma":
+        from vector_store_manager import get_manager
+        return get_manager().get_store(namespace, lambda: get_artifact(context, key=context_key).chunks)
+    import numpy_vector_store
+
+    def build():
+        # Chunks and their vectors come from the stored context artifact, not the raw text
+        artifact = get_artifact(context, with_embeddings=True, key=context_key)
+        return numpy_vector_store.NumpyVectorStore.from_vectors(artifact.chunks, artifact.embeddings, get_embeddings())
+
+    return numpy_vector_store.get_store(namespace, build)
+
+def needs_retrieval(context: Optional[str], token_budget: int = CONTEXT_TOKEN_BUDGET) -> bool:
+    """True when retrieval is on and the context is too large to send whole."""
+    return RETRIEVAL_ENABLED and bool(context) and len(context) > token_budget * CHARS_PER_TOKEN
+
+def retrieve_context(context: str, queries: Union[str, List[str]], k: int = RETRIEVAL_TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET, context_key: Optional[str] = None) -> str:
+    """
+    Returns the chunks of `context` most relevant to `queries`, limited to
+    roughly `token_budget` tokens. Contexts that already fit the budget are
+    returned unchanged. With several queries, their results are interleaved
+    so each one is represented. `context_key` is the persisted context hash,
+    used to load the context's artifact without re-hashing it.
+    """
+    if not needs_retrieval(context, token_budget):
+        return context
+    char_budget = token_budget * CHARS_PER_TOKEN
+
+    queries = [queries] if isinstance(queries, str) else [q for q in queries if q]
+    if not queries:
+        return context[:char_budget]
+
+    store = index_context(context, context_key=context_key)
+    per_query = max(1, k // len(queries)) if len(queries) > 1 else k
+    if hasattr(store, "batch_similarity_search"):
+        ranked = [[doc.page_content for doc in docs] for docs in store.batch_similarity_search(queries, k=per_query)]
+    else:
+        ranked = [[doc.page_content for doc in store.similarity_search(q, k=per_query)] for q in queries]
+
+    selected, used = [], 0
+    for rank in range(per_query):
+        for results in ranked:
+            if rank >= len(results) or results[rank] in selected:
+                continue
+            if used + len(results[rank]) > char_budget:
+                return "\n\n".join(selected)
+            selected.append(results[rank])
+            used += len(results[rank])
+    return "\n\n".join(selected)
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an educator. Create a concise, structured, and engaging study summary for the given topic based strictly on the provided context. Use bullet points and bold text for key terms."),
+    ("user", "Topic: {topic}\nContext: {context}")
+])
+llm_gateway.register_prompt("summary", SUMMARY_PROMPT, StrOutputParser())
+
+def generate_summary(context: str, topic: str, bypass_cache: bool = False) -> str:
     """Generates a concise summary/study material from the context."""
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an educator. Create a concise, structured, and engaging study summary for the given topic based strictly on the provided context. Use bullet points and bold text for key terms."),
-        ("user", "Topic: {topic}\nContext: {context}")
-    ])
-    
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({"topic": topic, "context": context})
+    return llm_gateway.invoke("summary", {"topic": topic, "context": context}, cached=True, bypass_cache=bypass_cache)
+
+async def agenerate_summary(context: str, topic: str, bypass_cache: bool = False) -> str:
+    """Async variant of generate_summary."""
+    return await llm_gateway.ainvoke("summary", {"topic": topic, "context": context}, cached=True, bypass_cache=bypass_cache)
 
 class MCQList(BaseModel):
-    mcqs: List[MCQ] = Field(description="A list of 3-5 Multiple Choice Questions.")
+    mcqs: List[MCQ] = Field(description="A list of Multiple Choice Questions, as many as requested.")
 
-def generate_mcqs(context: str, topic: str, seen_questions: List[str] = []) -> List[MCQ]:
-    """Generates 3-5 MCQs based on the provided context, avoiding duplicates."""
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
-    
-    parser = JsonOutputParser(pydantic_object=MCQList)
-    
+_mcq_parser = JsonOutputParser(pydantic_object=MCQList)
+MCQ_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an educator. Generate {count} Multiple Choice Questions (MCQs) based strictly on the provided context. Each question must have exactly 4 options and one clearly correct index. Return as JSON."),
+    ("user", "Topic: {topic}\nContext: {context}{avoid_block}\n\n{format_instructions}")
+]).partial(format_instructions=_mcq_parser.get_format_instructions())
+llm_gateway.register_prompt("mcqs", MCQ_PROMPT, _mcq_parser)
+
+def _mcq_inputs(context: str, topic: str, seen_questions: List[str], objectives: Optional[List[str]], count: Optional[int] = None, context_key: Optional[str] = None) -> dict:
+    context = retrieve_context(context, [topic] + list(objectives or []), context_key=context_key)
     avoid_block = ""
     if seen_questions:
         avoid_block = f"\nCRITICAL: DO NOT use any of these questions as they have already been used: {seen_questions}. Please focus on different nuances or aspects of the topic."
+    return {"topic": topic, "context": context, "avoid_block": avoid_block, "count": str(count) if count else "3-5"}
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an educator. Generate 3-5 Multiple Choice Questions (MCQs) based strictly on the provided context. Each question must have exactly 4 options and one clearly correct index. Return as JSON."),
-        ("user", "Topic: {topic}\nContext: {context}{avoid_block}\n\n{format_instructions}")
-    ]).partial(format_instructions=parser.get_format_instructions())
-    
-    chain = prompt | llm | parser
-    result = chain.invoke({"topic": topic, "context": context, "avoid_block": avoid_block})
+def _to_mcqs(result: dict) -> List[MCQ]:
     # Convert dicts to MCQ objects if necessary, though JsonOutputParser with pydantic_object helps
     return [MCQ(**m) if isinstance(m, dict) else m for m in result["mcqs"]]
 
+def generate_mcqs(context: str, topic: str, seen_questions: List[str] = [], bypass_cache: bool = False, objectives: Optional[List[str]] = None, count: Optional[int] = None, context_key: Optional[str] = None) -> List[MCQ]:
+    """Generates `count` (default 3-5) MCQs based on the provided context, avoiding duplicates."""
+    inputs = _mcq_inputs(context, topic, seen_questions, objectives, count, context_key)
+    return _to_mcqs(llm_gateway.invoke("mcqs", inputs, cached=True, bypass_cache=bypass_cache))
+
+async def agenerate_mcqs(context: str, topic: str, seen_questions: List[str] = [], bypass_cache: bool = False, objectives: Optional[List[str]] = None, count: Optional[int] = None, context_key: Optional[str] = None) -> List[MCQ]:
+    """Async variant of generate_mcqs; retrieval runs off the event loop."""
+    inputs = await asyncio.to_thread(_mcq_inputs, context, topic, seen_questions, objectives, count, context_key)
+    return _to_mcqs(await llm_gateway.ainvoke("mcqs", inputs, cached=True, bypass_cache=bypass_cache))
+
+class StudyMaterial(BaseModel):
+    summary: str = Field(description="A concise, structured study summary in Markdown, using bullet points and bold text for key terms.")
+    mcqs: List[MCQ] = Field(description="A list of 3-5 Multiple Choice Questions.")
+
+_study_material_parser = JsonOutputParser(pydantic_object=StudyMaterial)
+STUDY_MATERIAL_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an educator. Based strictly on the provided context, produce two things in a single response: (1) a concise, structured, and engaging study summary for the given topic, using bullet points and bold text for key terms, and (2) 3-5 Multiple Choice Questions (MCQs), each with exactly 4 options and one clearly correct index. Return as JSON."),
+    ("user", "Topic: {topic}\nContext: {context}\n\n{format_instructions}")
+]).partial(format_instructions=_study_material_parser.get_format_instructions())
+llm_gateway.register_prompt("study_material", STUDY_MATERIAL_PROMPT, _study_material_parser)
+
+def generate_study_material(context: str, topic: str, bypass_cache: bool = False) -> tuple[str, List[MCQ]]:
+    """Generates the study summary and the MCQs in one call, so the context tokens are paid for once."""
+    result = llm_gateway.invoke("study_material", {"topic": topic, "context": context}, cached=True, bypass_cache=bypass_cache)
+    return result["summary"], _to_mcqs(result)
+
 class EvaluationScore(BaseModel):
     score: float = Field(description="A score from 0 to 100.")
     feedback: str = Field(description="Brief feedback on the answer.")
 
-def evaluate_answer(question: str, context: str, answer: str) -> float:
+_evaluation_parser = JsonOutputParser(pydantic_object=EvaluationScore)
+EVALUATION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an examiner. Evaluate the learner's answer based on the provided context. Give a score from 0 to 100 based on accuracy and completeness."),
+    ("user", "Question: {question}\nContext: {context}\nLearner's Answer: {answer}\n\n{format_instructions}")
+]).partial(format_instructions=_evaluation_parser.get_format_instructions())
+llm_gateway.register_prompt("evaluation", EVALUATION_PROMPT, _evaluation_parser)
+
+def evaluate_answer(question: str, context: str, answer: str, context_key: Optional[str] = None) -> float:
     """Evaluates a single answer against the context and returns a score."""
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
+    context = retrieve_context(context, question, context_key=context_key)
+    result = llm_gateway.invoke("evaluation", {"question": question, "context": context, "answer": answer})
+    return result["score"]
+
+FEYNMAN_INSTRUCTIONS = """You are a master educator using the Feynman Technique. 
+    Your goal is to transform complex information into something a 10-year-old can explain to their friends.
     
-    parser = JsonOutputParser(pydantic_object=EvaluationScore)
+    Use the 'Primary Context' and 'Simplified Web Context' to create a structured explanation.
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an examiner. Evaluate the learner's answer based on the provided context. Give a score from 0 to 100 based on accuracy and completeness."),
-        ("user", "Question: {question}\nContext: {context}\nLearner's Answer: {answer}\n\n{format_instructions}")
-    ]).partial(format_instructions=parser.get_format_instructions())
+    STRUCTURE YOUR RESPONSE AS FOLLOWS:
+    1. **The Core Idea**: A 1-sentence summary that avoids any technical terms.
+    2. **The Everyday Analogy**: Compare the concept to something very common (like a kitchen, a playground, or a backpack). Use vivid imagery.
+    3. **How it Works**: Explain the 'why' using the analogy.
+    4. **Quick Recap**: A simple takeaway.
     
-    chain = prompt | llm | parser
-    result = chain.invoke({"question": question, "context": context, "answer": answer})
-    return result["score"]
+    RULES:
+    - Strictly NO jargon. If you must use a term, explain it with a toy analogy.
+    - Tone: Encouraging, clear, and vivid.
+    - Length: Concise but impactful (max 250 words)."""
 
-def generate_feynman_explanation(topic: str, context: str, simple_context: str) -> str:
+FEYNMAN_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", FEYNMAN_INSTRUCTIONS),
+    ("user", "Topic: {topic}\nPrimary Context: {context}\nSimplified Web Context: {simple_context}")
+])
+llm_gateway.register_prompt("feynman", FEYNMAN_PROMPT, StrOutputParser())
+
+def generate_feynman_explanation(topic: str, context: str, simple_context: str, bypass_cache: bool = False, context_key: Optional[str] = None) -> str:
     """Generates a simple, jargon-free explanation using the Feynman Technique (for a 10-year-old)."""
-    llm = ChatGroq(model="llama-3.3-70b-versatile")
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a master educator using the Feynman Technique. 
-        Your goal is to transform complex information into something a 10-year-old can explain to their friends.
-        
-        Use the 'Primary Context' and 'Simplified Web Context' to create a structured explanation.
-        
-        STRUCTURE YOUR RESPONSE AS FOLLOWS:
-        1. **The Core Idea**: A 1-sentence summary that avoids any technical terms.
-        2. **The Everyday Analogy**: Compare the concept to something very common (like a kitchen, a playground, or a backpack). Use vivid imagery.
-        3. **How it Works**: Explain the 'why' using the analogy.
-        4. **Quick Recap**: A simple takeaway.
-        
-        RULES:
-        - Strictly NO jargon. If you must use a term, explain it with a toy analogy.
-        - Tone: Encouraging, clear, and vivid.
-        - Length: Concise but impactful (max 250 words)."""),
-        ("user", "Topic: {topic}\nPrimary Context: {context}\nSimplified Web Context: {simple_context}")
-    ])
+    context = retrieve_context(context, topic, context_key=context_key)
+    return llm_gateway.invoke("feynman", {"topic": topic, "context": context, "simple_context": simple_context}, cached=True, bypass_cache=bypass_cache)
+
+async def agenerate_feynman_explanation(topic: str, context: str, simple_context: str, bypass_cache: bool = False, context_key: Optional[str] = None) -> str:
+    """Async variant of generate_feynman_explanation."""
+    context = await asyncio.to_thread(retrieve_context, context, topic, context_key=context_key)
+    return await llm_gateway.ainvoke("feynman", {"topic": topic, "context": context, "simple_context": simple_context}, cached=True, bypass_cache=bypass_cache)
+
+class FeynmanItem(BaseModel):
+    index: int = Field(description="The number of the concept this explanation belongs to.")
+    explanation: str = Field(description="The Feynman-style explanation for that concept.")
+
+class FeynmanBatch(BaseModel):
+    explanations: List[FeynmanItem] = Field(description="One explanation per concept, in the given order.")
+
+_feynman_batch_parser = JsonOutputParser(pydantic_object=FeynmanBatch)
+FEYNMAN_BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", FEYNMAN_INSTRUCTIONS + """
     
-    chain = prompt | llm | StrOutputParser()
-    return chain.invoke({"topic": topic, "context": context, "simple_context": simple_context})
+    You will receive several numbered concepts at once. Write one complete, independent explanation per concept,
+    following the structure above for each, and return them as JSON keyed by the concept number."""),
+    ("user", "Primary Context: {context}\n\nConcepts:\n{concepts}\n\n{format_instructions}")
+]).partial(format_instructions=_feynman_batch_parser.get_format_instructions())
+llm_gateway.register_prompt("feynman_batch", FEYNMAN_BATCH_PROMPT, _feynman_batch_parser)
+
+def _feynman_batch_concepts(topics: List[str], simple_contexts: List[str]) -> str:
+    return "\n\n".join(
+        f"[{i}] {topic}\nSimplified Web Context: {simple}"
+        for i, (topic, simple) in enumerate(zip(topics, simple_contexts))
+    )
+
+def _parse_feynman_batch(result: dict, count: int) -> List[str]:
+    by_index = {}
+    for item in result.get("explanations", []):
+        item = item if isinstance(item, dict) else item.dict()
+        by_index[int(item["index"])] = item["explanation"]
+    if sorted(by_index) != list(range(count)):
+        raise ValueError(f"Expected explanations for {count} concepts, got indices {sorted(by_index)}")
+    return [by_index[i] for i in range(count)]
+
+def generate_feynman_explanations(topics: List[str], context: str, simple_contexts: List[str], bypass_cache: bool = False, context_key: Optional[str] = None) -> List[str]:
+    """
+    Generates Feynman explanations for several concepts in a single LLM call.
+    Raises ValueError if the response does not contain exactly one explanation per concept.
+    """
+    context = retrieve_context(context, topics, context_key=context_key)
+    concepts = _feynman_batch_concepts(topics, simple_contexts)
+    # A malformed batch must fail before it reaches the cache, or every retry would re-read it
+    validate = lambda result: _parse_feynman_batch(result, len(topics))
+    result = llm_gateway.invoke("feynman_batch", {"context": context, "concepts": concepts}, cached=True, bypass_cache=bypass_cache, validate=validate)
+    return _parse_feynman_batch(result, len(topics))
+
+async def agenerate_feynman_explanations(topics: List[str], context: str, simple_contexts: List[str], bypass_cache: bool = False, context_key: Optional[str] = None) -> List[str]:
+    """Async variant of generate_feynman_explanations."""
+    context = await asyncio.to_thread(retrieve_context, context, topics, context_key=context_key)
+    concepts = _feynman_batch_concepts(topics, simple_contexts)
+    validate = lambda result: _parse_feynman_batch(result, len(topics))
+    result = await llm_gateway.ainvoke("feynman_batch", {"context": context, "concepts": concepts}, cached=True, bypass_cache=bypass_cache, validate=validate)
+    return _parse_feynman_batch(result, len(topics))
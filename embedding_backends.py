@@ -0,0 +1,149 @@
+"""
+embedding_backends.py - Selectable CPU backends for the local embedding model.
+
+"torch" (default) loads the model through HuggingFaceEmbeddings in fp32.
+"onnx-int8" serves the same sentence-transformers model through ONNX Runtime
+after dynamic int8 quantization, with the same mean pooling and L2
+normalization, behind the same LangChain Embeddings interface. The quantized
+model is exported once into EMBEDDING_ONNX_DIR and reused afterwards; this
+needs the optional `optimum[onnxruntime]` package.
+
+Run `python embedding_backends.py` for a parity check: cosine agreement with
+the fp32 model and relative throughput on a sample of texts.
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # "torch" or "onnx-int8"
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "./onnx_models")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 lets ONNX Runtime decide
+ONNX_BATCH_SIZE = 32
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length in sentence-transformers
+
+BACKENDS = ("torch", "onnx-int8")
+
+
+def _hub_id(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def export_int8_model(model_name: str, cache_dir: str = EMBEDDING_ONNX_DIR) -> str:
+    """Exports the model to ONNX and quantizes it to int8 once; returns the model directory."""
+    target = os.path.join(cache_dir, _hub_id(model_name).replace("/", "__") + "-int8")
+    if os.path.exists(os.path.join(target, "model_quantized.onnx")):
+        return target
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise ImportError("EMBEDDING_BACKEND=onnx-int8 needs `pip install optimum[onnxruntime]`") from e
+
+    print(f"--- Exporting {model_name} to ONNX int8 (one-time) ---")
+    ORTModelForFeatureExtraction.from_pretrained(_hub_id(model_name), export=True).save_pretrained(target)
+    AutoTokenizer.from_pretrained(_hub_id(model_name)).save_pretrained(target)
+    quantizer = ORTQuantizer.from_pretrained(target, file_name="model.onnx")
+    quantizer.quantize(save_dir=target, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+    return target
+
+
+class OnnxInt8Embeddings(Embeddings):
+    """Sentence-transformers model quantized to int8 and run on ONNX Runtime's CPU provider."""
+
+    def __init__(self, model_name: str, cache_dir: str = EMBEDDING_ONNX_DIR, threads: int = EMBEDDING_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = export_int8_model(model_name, cache_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model_quantized.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), ONNX_BATCH_SIZE):
+            encoded = self.tokenizer(
+                texts[start:start + ONNX_BATCH_SIZE], padding=True, truncation=True,
+                max_length=MAX_SEQ_LENGTH, return_tensors="np"
+            )
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._input_names}
+            hidden = self.session.run(None, feeds)[0]
+            # Mean pooling over real tokens, then L2 normalization, as in the sentence-transformers pipeline
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        return np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def load_embeddings(model_name: str, backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """Returns the embedding model for the selected backend."""
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "onnx-int8":
+        return OnnxInt8Embeddings(model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+
+SAMPLE_TEXTS = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "A binary search tree keeps keys ordered so lookups take logarithmic time.",
+    "The French Revolution began in 1789 and reshaped European politics.",
+    "Gradient descent updates parameters in the direction that reduces the loss.",
+    "Supply and demand determine the market price of a good.",
+    "Mitochondria are the site of cellular respiration in eukaryotic cells.",
+    "TCP guarantees ordered, reliable delivery of a byte stream between hosts.",
+    "Newton's second law states that force equals mass times acceleration.",
+]
+
+
+def parity_check(model_name: str = "all-MiniLM-L6-v2", texts: Optional[List[str]] = None, repeats: int = 8) -> Dict[str, float]:
+    """Compares the int8 backend against fp32: per-text cosine agreement and throughput."""
+    texts = (texts or SAMPLE_TEXTS) * repeats
+    reference, quantized = load_embeddings(model_name, "torch"), load_embeddings(model_name, "onnx-int8")
+
+    start = time.perf_counter()
+    fp32 = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    fp32_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    int8 = np.asarray(quantized.embed_documents(texts), dtype=np.float32)
+    int8_seconds = time.perf_counter() - start
+
+    fp32 /= np.linalg.norm(fp32, axis=1, keepdims=True)
+    int8 /= np.linalg.norm(int8, axis=1, keepdims=True)
+    cosines = (fp32 * int8).sum(axis=1)
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "fp32_seconds": fp32_seconds,
+        "int8_seconds": int8_seconds,
+        "speedup": fp32_seconds / int8_seconds if int8_seconds else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    report = parity_check()
+    print(f"Texts:        {report['texts']}")
+    print(f"Cosine mean:  {report['mean_cosine']:.4f} (min {report['min_cosine']:.4f})")
+    print(f"fp32 time:    {report['fp32_seconds']:.3f}s")
+    print(f"int8 time:    {report['int8_seconds']:.3f}s ({report['speedup']:.1f}x)")
@@ -0,0 +1,165 @@
+"""
+embedding_cache.py - Content-hash keyed embedding cache on a memory-mapped float32 file.
+
+Popular topics bring back the same search snippets, so the same chunks get
+embedded again and again. Each chunk is keyed by a 16-byte hash of its text;
+vectors are appended as rows of a raw float32 file that readers map with
+np.memmap, and a parallel index file holds one digest per row. Worker
+processes share both files: appends happen under an exclusive file lock and
+every process picks up rows written by the others on its next miss. Only
+texts that miss the cache are sent to the model, in batches.
+"""
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, the cache still works per process
+    fcntl = None
+
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+DIGEST_SIZE = 16
+DTYPE = np.float32
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """Append-only digest -> vector store shared between processes through mmap."""
+
+    def __init__(self, directory: str, max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        os.makedirs(directory, exist_ok=True)
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._index_path = os.path.join(directory, "index.bin")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, ".lock")
+        self._rows: Dict[bytes, int] = {}
+        self._synced = 0
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._warned_full = False
+
+    def _file_lock(self):
+        handle = open(self._lock_path, "a+")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _file_unlock(self, handle) -> None:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+    def _sync(self) -> None:
+        """Maps rows appended since the last sync, by this or any other process."""
+        total = os.path.getsize(self._index_path) // DIGEST_SIZE if os.path.exists(self._index_path) else 0
+        if total <= self._synced:
+            return
+        if self._dim is None:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+        with open(self._index_path, "rb") as f:
+            f.seek(self._synced * DIGEST_SIZE)
+            data = f.read((total - self._synced) * DIGEST_SIZE)
+        for i in range(total - self._synced):
+            self._rows.setdefault(data[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], self._synced + i)
+        self._synced = total
+        self._matrix = np.memmap(self._vectors_path, dtype=DTYPE, mode="r", shape=(total, self._dim))
+
+    def get_many(self, digests: List[bytes]) -> Dict[bytes, np.ndarray]:
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._sync()
+            found = {d: np.array(self._matrix[self._rows[d]]) for d in digests if d in self._rows}
+        self.hits += len(found)
+        self.misses += len(digests) - len(found)
+        return found
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray) -> None:
+        with self._lock:
+            handle = self._file_lock()
+            try:
+                self._sync()
+                new = [(d, v) for d, v in zip(digests, vectors) if d not in self._rows]
+                if not new:
+                    return
+                if self._synced + len(new) > self.max_rows:
+                    if not self._warned_full:
+                        print(f"⚠️  Embedding cache is full ({self.max_rows} rows); new chunks will not be cached.")
+                        self._warned_full = True
+                    return
+                if self._dim is None:
+                    self._dim = int(vectors.shape[1])
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self._dim}, f)
+                block = np.asarray([v for _, v in new], dtype=DTYPE)
+                # Vectors go first so the index never points past them; truncating drops
+                # rows a crashed writer appended without indexing.
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(self._synced * self._dim * np.dtype(DTYPE).itemsize)
+                    f.write(block.tobytes())
+                with open(self._index_path, "ab") as f:
+                    f.write(b"".join(d for d, _ in new))
+                self._sync()
+            finally:
+                self._file_unlock(handle)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "rows": self._synced, "max_rows": self.max_rows}
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that only sends cache misses to the wrapped model."""
+
+    def __init__(self, base: Embeddings, namespace: str, directory: str = EMBEDDING_CACHE_DIR, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.base = base
+        self.batch_size = batch_size
+        # One cache per model so switching models never mixes vector spaces
+        safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in namespace)
+        self.cache = EmbeddingCache(os.path.join(directory, safe))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [text_digest(t) for t in texts]
+        found = self.cache.get_many(digests)
+
+        missing: Dict[bytes, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest not in found:
+                missing.setdefault(digest, text)
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = np.asarray(self.base.embed_documents([t for _, t in batch]), dtype=DTYPE)
+            self.cache.put_many([d for d, _ in batch], vectors)
+            found.update(zip((d for d, _ in batch), vectors))
+
+        return [found[d].tolist() for d in digests]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from documents, so they get their own keys
+        digest = text_digest("\0query\0" + text)
+        found = self.cache.get_many([digest])
+        if digest in found:
+            return found[digest].tolist()
+        vector = np.asarray(self.base.embed_query(text), dtype=DTYPE)
+        self.cache.put_many([digest], vector[None, :])
+        return vector.tolist()
@@ -0,0 +1,189 @@
+"""
+embedding_service.py - Embedding model in a separate process pool with request coalescing.
+
+Chunking and embedding are CPU-bound; run on the API's own threads they hold
+the GIL and stall every other request on that worker. With
+EMBEDDING_SERVICE_ENABLED=1 the model lives in EMBEDDING_WORKERS spawned
+processes instead. A client-side batching thread collects embed requests
+from concurrent sessions for up to EMBEDDING_BATCH_WAIT_MS (or until
+EMBEDDING_MAX_BATCH texts) and sends them to the pool as one model call,
+then hands every caller its own slice of the result.
+
+`RemoteEmbeddings` exposes the service through the LangChain Embeddings
+interface; `chunk_document` offloads splitting a whole document as well,
+leaving its embedding to the batched path.
+"""
+import os
+import queue
+import asyncio
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+load_dotenv()
+
+EMBEDDING_SERVICE_ENABLED = os.getenv("EMBEDDING_SERVICE_ENABLED", "0") == "1"
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "128"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+
+# --- Worker process side ---
+
+_model = None
+
+
+def _init_worker(model_name: str, backend: str) -> None:
+    global _model
+    from embedding_backends import load_embeddings
+    _model = load_embeddings(model_name, backend)
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_model.embed_documents(texts), dtype=np.float32)
+
+
+def _embed_query(text: str) -> np.ndarray:
+    return np.asarray(_model.embed_query(text), dtype=np.float32)
+
+
+def _chunk(text: str) -> List[str]:
+    from context_utils import chunk_text
+    return chunk_text(text)
+
+
+# --- Client side ---
+
+class EmbeddingService:
+    """Process pool holding the model plus a thread that coalesces concurrent embed requests."""
+
+    def __init__(self, model_name: str, backend: str, workers: int = EMBEDDING_WORKERS,
+                 max_batch: int = EMBEDDING_MAX_BATCH, wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        # "spawn" so workers never inherit torch state or locks from a threaded parent
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, backend),
+        )
+        self.max_batch = max_batch
+        self.wait_seconds = wait_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._batch_loop, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def _batch_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            size = len(item[0])
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=self.wait_seconds)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # Finish this batch, then stop
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._dispatch(pending)
+
+    def _dispatch(self, pending: List[Tuple[List[str], Future]]) -> None:
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        self.batches += 1
+        self.requests += len(pending)
+
+        def split(result: Future) -> None:
+            error = result.exception()
+            offset = 0
+            for request_texts, future in pending:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result.result()[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+        self._pool.submit(_embed_batch, texts).add_done_callback(split)
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queues texts for the next batch; the future resolves to a float32 array with one row per text."""
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._queue.put((list(texts), future))
+        return future
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        # Queries go straight to the pool: models may embed them differently from documents
+        return self._pool.submit(_embed_query, text).result()
+
+    def chunk(self, text: str) -> List[str]:
+        """Splits a whole document in a worker process."""
+        return self._pool.submit(_chunk, text).result()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> EmbeddingService:
+    """Returns the shared service, starting it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                from context_utils import EMBEDDING_MODEL
+                from embedding_backends import EMBEDDING_BACKEND
+                _service = EmbeddingService(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+                atexit.register(_service.shutdown)
+    return _service
+
+
+def get_stats() -> Optional[dict]:
+    return _service.stats() if _service is not None else None
+
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain Embeddings backed by the shared embedding service."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_service().embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_service().embed_query(text).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return (await get_service().aembed(texts)).tolist()
+
+
+def chunk_document(text: str) -> List[str]:
+    return get_service().chunk(text)
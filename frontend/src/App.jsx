@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { BookOpen, CheckCircle, Brain, LayoutDashboard } from 'lucide-react';
-import { startLearning, getQuiz, submitQuiz, getRemediation, resetState } from './api';
+import { streamLearning, getQuiz, submitQuiz, getRemediation, resetState } from './api';
 import { motion, AnimatePresence } from 'framer-motion';
 import './index.css';
 
@@ -38,7 +38,15 @@ function App() {
     setLoading(true);
     setError(null);
     try {
-      const data = await startLearning(topic, objectives);
+      setState(prev => ({ ...prev, topic, summary: '', totalQuestions: 0 }));
+      const data = await streamLearning(topic, objectives, (event, payload) => {
+        if (event === 'token') {
+          // Show the study material as soon as the first tokens arrive
+          setState(prev => ({ ...prev, summary: prev.summary + payload.text }));
+          setStep('learning');
+          setLoading(false);
+        }
+      });
       setState(prev => ({ ...prev, topic, summary: data.summary, relevanceScore: data.relevance_score, totalQuestions: 0 }));
       setStep('learning');
     } catch (err) {
@@ -41,9 +41,56 @@ export const register = async (username, email, password) => {
   return response.data;
 };
 
-export const startLearning = async (topic, objectives) => {
-  const response = await api.post('/start', { topic, objectives });
-  return response.data;
+// /start queues a background job; poll its result until the pipeline finishes or timeoutMs passes.
+export const startLearning = async (topic, objectives, pollIntervalMs = 1500, timeoutMs = 10 * 60 * 1000) => {
+  const { data: job } = await api.post('/start', { topic, objectives });
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const response = await api.get(job.result_url);
+    if (response.status === 200) {
+      return response.data;
+    }
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+  }
+  throw new Error(`Learning job ${job.job_id} did not finish within ${Math.round(timeoutMs / 1000)}s`);
+};
+
+// Streams /start/stream server-sent events, calling onEvent(name, data) for each one.
+// Resolves with the final `done` payload.
+export const streamLearning = async (topic, objectives, onEvent) => {
+  const params = new URLSearchParams({ topic });
+  objectives.forEach((objective) => params.append('objectives', objective));
+  const token = localStorage.getItem('token');
+
+  const response = await fetch(`${API_BASE_URL}/start/stream?${params}`, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'error') throw new Error(data.detail);
+      if (event === 'done') result = data;
+      onEvent(event, data);
+    }
+  }
+  return result;
 };
 
 export const getQuiz = async () => {
@@ -0,0 +1,134 @@
+"""
+llm_gateway.py - Single entry point for every LLM call in the pipeline.
+
+Owns one long-lived ChatGroq client backed by keep-alive httpx pools and builds
+each prompt chain once, so requests stop paying for TLS handshakes and object
+construction on every call.
+"""
+import os
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from langchain_groq import ChatGroq
+from dotenv import load_dotenv
+import llm_cache
+
+load_dotenv()
+
+MODEL_NAME = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+
+_lock = threading.Lock()
+_llm: Optional[ChatGroq] = None
+_prompts: Dict[str, Tuple[Any, Any]] = {}
+_chains: Dict[Tuple[str, Optional[float]], Any] = {}
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_llm() -> ChatGroq:
+    """Returns the shared chat model, creating its pooled HTTP clients on first use."""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = ChatGroq(
+                    model=MODEL_NAME,
+                    timeout=DEFAULT_TIMEOUT,
+                    http_client=httpx.Client(limits=_pool_limits(), timeout=DEFAULT_TIMEOUT),
+                    http_async_client=httpx.AsyncClient(limits=_pool_limits(), timeout=DEFAULT_TIMEOUT),
+                )
+    return _llm
+
+
+def register_prompt(name: str, prompt, parser) -> None:
+    """Registers a prompt/parser pair; the chain itself is built lazily on first call."""
+    _prompts[name] = (prompt, parser)
+
+
+def get_prompt(name: str):
+    """Returns the prompt template registered under `name`."""
+    return _prompts[name][0]
+
+
+def _template_fingerprint(name: str) -> str:
+    prompt = get_prompt(name)
+    partials = {k: str(v) for k, v in getattr(prompt, "partial_variables", {}).items()}
+    return prompt.pretty_repr() + repr(sorted(partials.items()))
+
+
+def get_chain(name: str, timeout: Optional[float] = None):
+    """Returns the prebuilt `prompt | llm | parser` chain, one per (name, timeout)."""
+    key = (name, timeout)
+    chain = _chains.get(key)
+    if chain is None:
+        if name not in _prompts:
+            raise KeyError(f"No prompt registered under '{name}'")
+        prompt, parser = _prompts[name]
+        llm = get_llm()
+        if timeout is not None:
+            llm = llm.bind(timeout=timeout)
+        chain = prompt | llm | parser
+        with _lock:
+            chain = _chains.setdefault(key, chain)
+    return chain
+
+
+def _cache_lookup(name: str, inputs: Dict[str, Any], bypass_cache: bool):
+    cache = llm_cache.get_cache()
+    if cache is None:
+        return None, None, None
+    key = llm_cache.make_key(MODEL_NAME, _template_fingerprint(name), inputs)
+    if bypass_cache:
+        return cache, key, None
+    found, value = cache.get(key)
+    return cache, key, (value if found else None)
+
+
+def invoke(name: str, inputs: Dict[str, Any], timeout: Optional[float] = None, cached: bool = False, bypass_cache: bool = False,
+           validate: Optional[Callable[[Any], Any]] = None):
+    """
+    Runs the named chain synchronously.
+    With `cached=True` the response is served from / stored in the LLM cache;
+    `bypass_cache=True` skips the lookup but still refreshes the stored entry.
+    `validate` is called on a fresh response before it is stored; if it raises,
+    the error propagates and nothing is cached.
+    """
+    if not cached:
+        return get_chain(name, timeout).invoke(inputs)
+    cache, key, hit = _cache_lookup(name, inputs, bypass_cache)
+    if hit is not None:
+        return hit
+    result = get_chain(name, timeout).invoke(inputs)
+    if validate is not None:
+        validate(result)
+    if cache is not None:
+        cache.set(key, result)
+    return result
+
+
+async def ainvoke(name: str, inputs: Dict[str, Any], timeout: Optional[float] = None, cached: bool = False, bypass_cache: bool = False,
+                  validate: Optional[Callable[[Any], Any]] = None):
+    """Runs the named chain on the shared async HTTP client (same cache and `validate` semantics as `invoke`)."""
+    if not cached:
+        return await get_chain(name, timeout).ainvoke(inputs)
+    # The cache is SQLite-backed, so its reads and writes stay off the event loop
+    cache, key, hit = await asyncio.to_thread(_cache_lookup, name, inputs, bypass_cache)
+    if hit is not None:
+        return hit
+    result = await get_chain(name, timeout).ainvoke(inputs)
+    if validate is not None:
+        validate(result)
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, result)
+    return result
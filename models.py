@@ -24,6 +24,8 @@ class AgentState(TypedDict):
     """
     checkpoint: Checkpoint
     gathered_info: List[str]
+    context_sources: Optional[List[dict]]  # Web snippets with the objective(s) each one came from
+    context_hash: Optional[str]  # Key of the stored chunk artifact for checkpoint.context (see context_artifacts)
     is_relevant: bool
     relevance_score: float
     iterations: int
@@ -0,0 +1,203 @@
+"""
+notes_store.py - Local notes backend with an on-disk BM25 inverted index.
+
+Markdown and text files under NOTES_DIR are split into paragraph-sized
+passages and indexed into a SQLite inverted index (term -> passage, term
+frequency). The index is updated incrementally: only files whose mtime or
+size changed are re-read, and deleted files are dropped. Queries score
+passages with Okapi BM25 and return the best ones as context.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NOTES_DIR = os.getenv("NOTES_DIR", "./notes")
+NOTES_INDEX_PATH = os.getenv("NOTES_INDEX_PATH", "./notes_index.db")
+NOTES_TOP_K = int(os.getenv("NOTES_TOP_K", "5"))
+NOTES_MIN_SCORE = float(os.getenv("NOTES_MIN_SCORE", "2.0"))
+NOTES_MAX_CHARS = int(os.getenv("NOTES_MAX_CHARS", "4000"))
+NOTES_REFRESH_INTERVAL = float(os.getenv("NOTES_REFRESH_INTERVAL", "30"))
+
+NOTE_EXTENSIONS = (".md", ".markdown", ".txt")
+PASSAGE_CHARS = 800
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "with", "intro", "introduction",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Groups consecutive paragraphs into passages of roughly `max_chars`."""
+    passages, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+class NotesIndex:
+    """SQLite-backed BM25 index over a directory of notes."""
+
+    def __init__(self, notes_dir: str = NOTES_DIR, index_path: str = NOTES_INDEX_PATH):
+        self.notes_dir = notes_dir
+        self._lock = threading.Lock()
+        self._last_refresh: Optional[float] = None  # None until the first refresh, which always runs
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, text TEXT NOT NULL, length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_passages_path ON passages (path);
+            CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, passage_id INTEGER NOT NULL, tf INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (term);
+            CREATE INDEX IF NOT EXISTS idx_postings_passage ON postings (passage_id);
+            """
+        )
+        self._conn.commit()
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        found = {}
+        for root, _, files in os.walk(self.notes_dir):
+            for name in files:
+                if name.lower().endswith(NOTE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found[os.path.relpath(path, self.notes_dir)] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def _remove_file(self, path: str) -> None:
+        self._conn.execute("DELETE FROM postings WHERE passage_id IN (SELECT id FROM passages WHERE path = ?)", (path,))
+        self._conn.execute("DELETE FROM passages WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _index_file(self, path: str, mtime: float, size: int) -> None:
+        with open(os.path.join(self.notes_dir, path), "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        for passage in split_passages(text):
+            counts = Counter(tokenize(passage))
+            if not counts:
+                continue
+            cursor = self._conn.execute(
+                "INSERT INTO passages (path, text, length) VALUES (?, ?, ?)",
+                (path, passage, sum(counts.values())),
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (term, passage_id, tf) VALUES (?, ?, ?)",
+                [(term, cursor.lastrowid, tf) for term, tf in counts.items()],
+            )
+        self._conn.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)", (path, mtime, size))
+
+    def refresh(self, force: bool = False) -> int:
+        """Re-indexes added or changed files and drops deleted ones. Returns the number of files touched."""
+        if not os.path.isdir(self.notes_dir):
+            return 0
+        with self._lock:
+            if not force and self._last_refresh is not None and time.monotonic() - self._last_refresh < NOTES_REFRESH_INTERVAL:
+                return 0
+            on_disk = self._scan()
+            indexed = {row[0]: (row[1], row[2]) for row in self._conn.execute("SELECT path, mtime, size FROM files")}
+            touched = 0
+            for path in indexed.keys() - on_disk.keys():
+                self._remove_file(path)
+                touched += 1
+            for path, (mtime, size) in on_disk.items():
+                if indexed.get(path) != (mtime, size):
+                    self._remove_file(path)
+                    self._index_file(path, mtime, size)
+                    touched += 1
+            self._conn.commit()
+            self._last_refresh = time.monotonic()
+        if touched:
+            print(f"--- Notes index updated ({touched} file(s) changed) ---")
+        return touched
+
+    def search(self, query: str, k: int = NOTES_TOP_K) -> List[Tuple[float, str, str]]:
+        """Returns up to `k` (score, path, passage) tuples ranked by BM25."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM passages").fetchone()
+            if not total:
+                return []
+            scores: Dict[int, float] = {}
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.passage_id, p.tf, s.length FROM postings p JOIN passages s ON s.id = p.passage_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+                for passage_id, tf, length in rows:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            results = []
+            for passage_id, score in best:
+                path, text = self._conn.execute("SELECT path, text FROM passages WHERE id = ?", (passage_id,)).fetchone()
+                results.append((score, path, text))
+        return results
+
+
+_index: Optional[NotesIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_notes_index() -> Optional[NotesIndex]:
+    """Returns the shared index, or None when there is no notes directory."""
+    global _index
+    if not os.path.isdir(NOTES_DIR):
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NotesIndex()
+    return _index
+
+
+def search_notes(topic: str, objectives: Optional[List[str]] = None, k: int = NOTES_TOP_K, min_score: float = NOTES_MIN_SCORE, max_chars: int = NOTES_MAX_CHARS) -> str:
+    """Returns the best-matching note passages for a topic as one context string ("" if none qualify)."""
+    index = get_notes_index()
+    if index is None:
+        return ""
+    index.refresh()
+    query = " ".join([topic] + list(objectives or []))
+    parts, used = [], 0
+    for score, path, text in index.search(query, k):
+        if score < min_score or used >= max_chars:
+            break
+        if used + len(text) > max_chars:
+            # Cut the passage at a word boundary to fit the remaining budget instead of dropping it
+            parts.append(f"[{path}] {text[:max_chars - used].rsplit(' ', 1)[0]}")
+            break
+        parts.append(f"[{path}] {text}")
+        used += len(text)
+    return "\n\n".join(parts)
@@ -0,0 +1,156 @@
+"""
+numpy_vector_store.py - Compact in-process vector index for per-session retrieval.
+
+A session's context is a few dozen 500-character chunks, so a full Chroma
+collection (client, SQLite persistence, HNSW build) is mostly setup cost.
+NumpyVectorStore keeps one contiguous float32 matrix of unit vectors plus
+parallel id/text/metadata lists; a search is one matrix product and an
+argpartition, and several queries are answered with a single matmul.
+
+Stores are kept in a bounded in-process LRU keyed by namespace. Rebuilding an
+evicted store after a restart costs no model calls as long as the embedding
+cache holds its chunks, or none at all when its context artifact stores the
+chunk embeddings.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+load_dotenv()
+
+MAX_CACHED_INDEXES = int(os.getenv("MAX_CACHED_INDEXES", "64"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+class NumpyVectorStore(VectorStore):
+    """Brute-force cosine similarity over a float32 matrix, behind the LangChain VectorStore interface."""
+
+    def __init__(self, embedding: Embeddings):
+        self._embedding = embedding
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = _normalize(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+        self._matrix = vectors if not len(self) else np.vstack([self._matrix, vectors])
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas or [{} for _ in texts])
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids is None:
+            return False
+        drop = set(ids)
+        keep = [i for i, id_ in enumerate(self._ids) if id_ not in drop]
+        self._matrix = self._matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+        self._ids = [self._ids[i] for i in keep]
+        self._texts = [self._texts[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        return True
+
+    def _top_k(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """(row, cosine) pairs, best first, for each query row; one matmul for all queries."""
+        if not len(self):
+            return [[] for _ in range(len(query_vectors))]
+        k = min(k, len(self))
+        scores = _normalize(query_vectors) @ self._matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row_scores[candidates])]
+            results.append([(int(i), float(row_scores[i])) for i in ordered])
+        return results
+
+    def _to_documents(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self._texts[i], metadata=self._metadatas[i], id=self._ids[i]), score)
+            for i, score in hits
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        hits = self._top_k(np.asarray([embedding], dtype=np.float32), k)[0]
+        return [doc for doc, _ in self._to_documents(hits)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        vector = np.asarray([self._embedding.embed_query(query)], dtype=np.float32)
+        return self._to_documents(self._top_k(vector, k)[0])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def batch_similarity_search(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        """Top-k documents for each query, scored with a single matrix product."""
+        if not queries:
+            return []
+        vectors = np.asarray([self._embedding.embed_query(q) for q in queries], dtype=np.float32)
+        return [[doc for doc, _ in self._to_documents(hits)] for hits in self._top_k(vectors, k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities of unit vectors
+        return lambda score: score
+
+    @classmethod
+    def from_vectors(cls, texts: List[str], vectors: np.ndarray, embedding: Embeddings, metadatas: Optional[List[dict]] = None) -> "NumpyVectorStore":
+        """Builds a store from precomputed document vectors; `embedding` is only used for queries."""
+        store = cls(embedding)
+        if texts:
+            store._matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+            store._ids = [uuid.uuid4().hex for _ in texts]
+            store._texts = list(texts)
+            store._metadatas = list(metadatas or [{} for _ in texts])
+        return store
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+_stores: "OrderedDict[str, NumpyVectorStore]" = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def get_store(namespace: str, build: Callable[[], NumpyVectorStore]) -> NumpyVectorStore:
+    """Returns the cached store for `namespace`, calling `build()` on a miss."""
+    with _stores_lock:
+        store = _stores.get(namespace)
+        if store is not None:
+            _stores.move_to_end(namespace)
+            return store
+    store = build()
+    with _stores_lock:
+        _stores[namespace] = store
+        while len(_stores) > MAX_CACHED_INDEXES:
+            _stores.popitem(last=False)
+    return store
+
+
+def get_stats() -> dict:
+    with _stores_lock:
+        return {"stores": len(_stores), "chunks": sum(len(s) for s in _stores.values()), "max_stores": MAX_CACHED_INDEXES}
@@ -0,0 +1,153 @@
+"""
+question_dedup.py - Semantic MCQ deduplication against a session's question history.
+
+Pasting every previously asked question into the MCQ prompt grows the prompt
+on each remedial loop and still lets paraphrases through. Instead, generated
+questions are embedded and compared to the history (and to each other) with
+one cosine matrix product; near-duplicates are dropped and only those slots
+are regenerated. The avoid-list sent to the model is capped at the
+QUESTION_AVOID_LIST_SIZE history questions most similar to what the model is
+being asked for, so the prompt stays the same size however long the session.
+"""
+import os
+import asyncio
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from models import MCQ
+from context_utils import generate_mcqs, agenerate_mcqs, get_embeddings
+
+load_dotenv()
+
+QUESTION_DEDUP_ENABLED = os.getenv("QUESTION_DEDUP_ENABLED", "1") == "1"
+QUESTION_DUP_THRESHOLD = float(os.getenv("QUESTION_DUP_THRESHOLD", "0.90"))
+QUESTION_AVOID_LIST_SIZE = int(os.getenv("QUESTION_AVOID_LIST_SIZE", "5"))
+QUESTION_REGEN_ROUNDS = int(os.getenv("QUESTION_REGEN_ROUNDS", "2"))
+
+
+def embed_questions(questions: List[str]) -> np.ndarray:
+    """Unit-normalized float32 embeddings, one row per question."""
+    if not questions:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.asarray(get_embeddings().embed_documents(questions), dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def duplicate_mask(candidates: np.ndarray, history: np.ndarray, threshold: float = QUESTION_DUP_THRESHOLD) -> np.ndarray:
+    """
+    True for each candidate whose cosine similarity to any history row, or to an
+    earlier kept candidate, reaches `threshold`.
+    """
+    if not len(candidates):
+        return np.zeros(0, dtype=bool)
+    duplicate = np.zeros(len(candidates), dtype=bool)
+    if len(history):
+        duplicate |= (candidates @ history.T).max(axis=1) >= threshold
+    within = candidates @ candidates.T
+    for j in range(1, len(candidates)):
+        if not duplicate[j] and (within[j, :j][~duplicate[:j]] >= threshold).any():
+            duplicate[j] = True
+    return duplicate
+
+
+def bounded_avoid_list(history: List[str], history_vectors: np.ndarray, probes: np.ndarray, size: int = QUESTION_AVOID_LIST_SIZE) -> List[str]:
+    """The `size` history questions closest to any probe vector, most similar first."""
+    if not history or not len(probes) or size <= 0:
+        return []
+    closeness = (history_vectors @ probes.T).max(axis=1)
+    return [history[i] for i in np.argsort(-closeness)[:size]]
+
+
+def _filter(mcqs: List[MCQ], history_vectors: np.ndarray) -> Tuple[List[MCQ], np.ndarray, List[MCQ], np.ndarray]:
+    vectors = embed_questions([m.question for m in mcqs])
+    mask = duplicate_mask(vectors, history_vectors)
+    kept = [m for m, dup in zip(mcqs, mask) if not dup]
+    rejected = [m for m, dup in zip(mcqs, mask) if dup]
+    return kept, vectors[~mask] if len(vectors) else vectors, rejected, vectors[mask] if len(vectors) else vectors
+
+
+def _stack(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if not len(a):
+        return b
+    return np.vstack([a, b]) if len(b) else a
+
+
+class _UniqueBatch:
+    """
+    Accept/reject bookkeeping for one deduplicated MCQ batch, shared by the
+    sync and async loops: `next_request()` gives the generate_mcqs arguments
+    for the next round (None when done), `add()` filters that round's output.
+    Both embed, so the async loop runs them in a thread.
+    """
+
+    def __init__(self, topic: str, objectives: Optional[List[str]], seen_questions: List[str], bypass_cache: bool = False):
+        self.seen_questions = list(seen_questions)
+        self.history_vectors = embed_questions(self.seen_questions)
+        probes = embed_questions([topic] + list(objectives or []))
+        self.avoid = bounded_avoid_list(self.seen_questions, self.history_vectors, probes)
+        # With a history the prompt changes every round, and a cached batch is likely a repeat
+        self.bypass_cache = bypass_cache or bool(self.seen_questions)
+        self.first: Optional[List[MCQ]] = None
+        self.accepted: List[MCQ] = []
+        self.rejected: List[MCQ] = []
+        self.rejected_vectors = np.zeros((0, 0), dtype=np.float32)
+        self.rounds = 0
+
+    def next_request(self) -> Optional[dict]:
+        if self.first is None:
+            return {"seen_questions": self.avoid, "bypass_cache": self.bypass_cache}
+        if not self.rejected or self.rounds >= QUESTION_REGEN_ROUNDS:
+            return None
+        self.rounds += 1
+        print(f"--- Regenerating {len(self.rejected)} near-duplicate MCQ(s) ---")
+        # Rows of history_vectors follow this order: seen questions, then accepted ones
+        history = self.seen_questions + [m.question for m in self.accepted]
+        avoid = _retry_request(history, self.history_vectors, self.rejected, self.rejected_vectors)
+        return {"seen_questions": avoid, "count": len(self.rejected), "bypass_cache": True}
+
+    def add(self, mcqs: List[MCQ]) -> None:
+        if self.first is None:
+            self.first = mcqs
+        else:
+            mcqs = mcqs[:len(self.rejected)]
+        kept, kept_vectors, self.rejected, self.rejected_vectors = _filter(mcqs, self.history_vectors)
+        self.accepted += kept
+        self.history_vectors = _stack(self.history_vectors, kept_vectors)
+
+    def result(self) -> List[MCQ]:
+        # Never return an empty quiz: if every question kept colliding, fall back to the first batch
+        return self.accepted or self.first or []
+
+
+def _retry_request(history: List[str], history_vectors: np.ndarray, rejected: List[MCQ], rejected_vectors: np.ndarray) -> List[str]:
+    # The rejected questions are what the model keeps drifting towards, so they anchor the avoid-list
+    avoid = [m.question for m in rejected]
+    extra = max(0, QUESTION_AVOID_LIST_SIZE - len(avoid))
+    return avoid + [q for q in bounded_avoid_list(history, history_vectors, rejected_vectors, extra) if q not in avoid]
+
+
+def generate_unique_mcqs(context: str, topic: str, seen_questions: List[str], objectives: Optional[List[str]] = None, context_key: Optional[str] = None, bypass_cache: bool = False) -> List[MCQ]:
+    """
+    Generates MCQs that are not near-duplicates of `seen_questions` or of each
+    other, regenerating only the rejected slots for up to QUESTION_REGEN_ROUNDS.
+    The LLM cache is bypassed whenever there is a history to avoid.
+    """
+    batch = _UniqueBatch(topic, objectives, seen_questions, bypass_cache)
+    request = batch.next_request()
+    while request is not None:
+        batch.add(generate_mcqs(context, topic, objectives=objectives, context_key=context_key, **request))
+        request = batch.next_request()
+    return batch.result()
+
+
+async def agenerate_unique_mcqs(context: str, topic: str, seen_questions: List[str], objectives: Optional[List[str]] = None, context_key: Optional[str] = None, bypass_cache: bool = False) -> List[MCQ]:
+    """Async variant of generate_unique_mcqs; embedding runs off the event loop."""
+    batch = await asyncio.to_thread(_UniqueBatch, topic, objectives, seen_questions, bypass_cache)
+    request = batch.next_request()
+    while request is not None:
+        mcqs = await agenerate_mcqs(context, topic, objectives=objectives, context_key=context_key, **request)
+        await asyncio.to_thread(batch.add, mcqs)
+        request = batch.next_request()
+    return batch.result()
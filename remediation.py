@@ -0,0 +1,62 @@
+"""
+remediation.py - Feynman remediation for a set of missed questions.
+
+Shared by the CLI graph (`remedial_node`) and the API (`/remediation`). By
+default all missed concepts go to the LLM in one structured prompt; if that
+response cannot be parsed, each concept falls back to its own call. Web
+lookups and fallback calls fan out concurrently, so wall-clock time tracks
+the slowest call rather than the sum of all of them.
+"""
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from concurrency import bounded_map, abounded_map
+from search_utils import search_for_simple_explanation, asearch_for_simple_explanation
+from context_utils import generate_feynman_explanation, generate_feynman_explanations, agenerate_feynman_explanation, agenerate_feynman_explanations
+
+load_dotenv()
+
+REMEDIATION_BATCHED = os.getenv("REMEDIATION_BATCHED", "1") == "1"
+REMEDIATION_MAX_CONCURRENCY = int(os.getenv("REMEDIATION_MAX_CONCURRENCY", "5"))
+
+
+def explain_concepts(concepts: List[str], context: str, batched: bool = REMEDIATION_BATCHED, max_in_flight: int = REMEDIATION_MAX_CONCURRENCY, context_key: Optional[str] = None) -> List[str]:
+    """Returns one Feynman explanation per concept, in the same order; `context_key` is the context's persisted hash."""
+    if not concepts:
+        return []
+
+    simple_contexts = bounded_map(search_for_simple_explanation, concepts, max_in_flight)
+
+    if batched and len(concepts) > 1:
+        try:
+            return generate_feynman_explanations(concepts, context, simple_contexts, context_key=context_key)
+        except Exception as e:
+            print(f"⚠️  Batched remediation failed ({e}). Falling back to per-question explanations.")
+
+    return bounded_map(
+        lambda pair: generate_feynman_explanation(pair[0], context, pair[1], context_key=context_key),
+        list(zip(concepts, simple_contexts)),
+        max_in_flight,
+    )
+
+
+async def aexplain_concepts(concepts: List[str], context: str, batched: bool = REMEDIATION_BATCHED, max_in_flight: int = REMEDIATION_MAX_CONCURRENCY, context_key: Optional[str] = None) -> List[str]:
+    """Async variant of explain_concepts."""
+    if not concepts:
+        return []
+
+    simple_contexts = await abounded_map(asearch_for_simple_explanation, concepts, max_in_flight)
+
+    if batched and len(concepts) > 1:
+        try:
+            return await agenerate_feynman_explanations(concepts, context, simple_contexts, context_key=context_key)
+        except Exception as e:
+            print(f"⚠️  Batched remediation failed ({e}). Falling back to per-question explanations.")
+
+    return await abounded_map(
+        lambda pair: agenerate_feynman_explanation(pair[0], context, pair[1], context_key=context_key),
+        list(zip(concepts, simple_contexts)),
+        max_in_flight,
+    )
@@ -0,0 +1,146 @@
+"""
+search_cache.py - TTL cache and offline snapshots for web search results.
+
+Results are cached in memory on the normalized query with a TTL and an LRU
+size bound, so repeat searches for popular topics skip the network and stop
+counting against DuckDuckGo's rate limits. Snapshot mode records every
+fetched result to a local JSON file ("record") or serves searches only from
+that file with no network at all ("replay"), for benchmarks and offline runs.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+SEARCH_SNAPSHOT_MODE = os.getenv("SEARCH_SNAPSHOT_MODE", "").lower()  # "", "record" or "replay"
+SEARCH_SNAPSHOT_PATH = os.getenv("SEARCH_SNAPSHOT_PATH", "./search_snapshot.json")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class TTLCache:
+    """Thread-safe in-memory cache with per-entry expiry and LRU eviction."""
+
+    def __init__(self, ttl_seconds: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {"hits": self.hits, "misses": self.misses, "entries": size, "max_entries": self.max_entries}
+
+
+class SearchSnapshot:
+    """Query -> result map persisted as JSON for recording and offline replay."""
+
+    def __init__(self, path: str = SEARCH_SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._results: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._results = json.load(f)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if key in self._results:
+                return True, self._results[key]
+        return False, None
+
+    def record(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._results[key] = value
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._results, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+cache = TTLCache()
+_snapshot: Optional[SearchSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[SearchSnapshot]:
+    global _snapshot
+    if SEARCH_SNAPSHOT_MODE not in ("record", "replay"):
+        return None
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = SearchSnapshot()
+    return _snapshot
+
+
+def _replay(key: str, query: str) -> Any:
+    found, value = get_snapshot().get(key)
+    if not found:
+        print(f"⚠️  No recorded search result for '{query}' in {SEARCH_SNAPSHOT_PATH}; returning empty result.")
+        return ""
+    return value
+
+
+def _store(key: str, value: Any) -> None:
+    cache.set(key, value)
+    if SEARCH_SNAPSHOT_MODE == "record":
+        get_snapshot().record(key, value)
+
+
+def cached_search(query: str, fetch: Callable[[str], Any]) -> Any:
+    """Returns the result for `query`, calling `fetch` only on a cache miss."""
+    key = normalize_query(query)
+    if SEARCH_SNAPSHOT_MODE == "replay":
+        return _replay(key, query)
+    found, value = cache.get(key)
+    if found:
+        return value
+    value = fetch(query)
+    _store(key, value)
+    return value
+
+
+async def acached_search(query: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+    """Async variant of cached_search."""
+    key = normalize_query(query)
+    if SEARCH_SNAPSHOT_MODE == "replay":
+        return _replay(key, query)
+    found, value = cache.get(key)
+    if found:
+        return value
+    value = await fetch(query)
+    _store(key, value)
+    return value
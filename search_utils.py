@@ -1,54 +1,240 @@
 import os
-from typing import List
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_groq import ChatGroq
+import asyncio
+import threading
+from typing import Dict, List, Optional
+import numpy as np
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import JsonOutputParser
 from dotenv import load_dotenv
+import llm_gateway
+from concurrency import bounded_map, abounded_map
+from search_cache import cached_search, acached_search
 
 load_dotenv()
 
-search = DuckDuckGoSearchRun()
+# DuckDuckGo tool, created on first search so importing this module stays cheap
+_search = None
+_search_lock = threading.Lock()
+
+def get_search():
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                from langchain_community.tools import DuckDuckGoSearchRun
+                _search = DuckDuckGoSearchRun()
+    return _search
+
+def __getattr__(name: str):
+    if name == "search":
+        return get_search()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Embedding pre-filter: decide obvious cases locally, escalate the gray zone to the LLM
+LOCAL_RELEVANCE_ENABLED = os.getenv("LOCAL_RELEVANCE_ENABLED", "1") == "1"
+RELEVANCE_ACCEPT_THRESHOLD = float(os.getenv("RELEVANCE_ACCEPT_THRESHOLD", "0.55"))
+RELEVANCE_REJECT_THRESHOLD = float(os.getenv("RELEVANCE_REJECT_THRESHOLD", "0.20"))
+
+# Per-objective web gathering
+WEB_RESULTS_PER_QUERY = int(os.getenv("WEB_RESULTS_PER_QUERY", "5"))
+WEB_GATHER_CONCURRENCY = int(os.getenv("WEB_GATHER_CONCURRENCY", "4"))
+
+_relevance_stats = {"local_accept": 0, "local_reject": 0, "llm": 0}
+_relevance_stats_lock = threading.Lock()
+
+def _objective_queries(topic: str, objectives: List[str]) -> List[tuple[str, str]]:
+    """One (objective, query) pair per objective; the bare topic if there are none."""
+    return [(objective, f"{topic} {objective}") for objective in objectives] or [(topic, topic)]
+
+def _fetch_snippets(query: str) -> List[Dict[str, str]]:
+    return get_search().api_wrapper.results(query, max_results=WEB_RESULTS_PER_QUERY)
+
+def _search_snippets(query: str) -> List[Dict[str, str]]:
+    # Errors are handled outside the cache so a failed search is never cached or recorded
+    try:
+        return cached_search(f"snippets: {query}", lambda _: _fetch_snippets(query))
+    except Exception as e:
+        print(f"⚠️  Search failed for '{query}': {e}")
+        return []
+
+async def _asearch_snippets(query: str) -> List[Dict[str, str]]:
+    async def fetch(_):
+        return await asyncio.to_thread(_fetch_snippets, query)
+    try:
+        return await acached_search(f"snippets: {query}", fetch)
+    except Exception as e:
+        print(f"⚠️  Search failed for '{query}': {e}")
+        return []
+
+def merge_snippets(objectives: List[str], results: List[List[Dict[str, str]]]) -> List[Dict]:
+    """
+    Merges per-objective search results, dropping duplicates (same link or same text)
+    and recording every objective that surfaced each snippet.
+    """
+    merged: List[Dict] = []
+    by_key: Dict[str, Dict] = {}
+    for objective, hits in zip(objectives, results):
+        for hit in hits:
+            text = (hit.get("snippet") or "").strip()
+            if not text:
+                continue
+            keys = [k for k in (hit.get("link"), " ".join(text.lower().split())) if k]
+            existing = next((by_key[k] for k in keys if k in by_key), None)
+            if existing is not None:
+                if objective not in existing["objectives"]:
+                    existing["objectives"].append(objective)
+                continue
+            snippet = {"objectives": [objective], "title": hit.get("title", ""), "link": hit.get("link", ""), "text": text}
+            merged.append(snippet)
+            for k in keys:
+                by_key[k] = snippet
+    return merged
+
+def format_snippets(snippets: List[Dict]) -> str:
+    return "\n\n".join(
+        f"[{', '.join(s['objectives'])}] {s['title']}: {s['text']}" if s["title"] else f"[{', '.join(s['objectives'])}] {s['text']}"
+        for s in snippets
+    )
+
+def gather_snippets_from_web(topic: str, objectives: List[str]) -> List[Dict]:
+    """
+    Issues one search per objective concurrently and returns the merged, deduplicated
+    snippets, each tagged with the objective(s) it came from.
+    """
+    pairs = _objective_queries(topic, objectives)
+    results = bounded_map(_search_snippets, [query for _, query in pairs], WEB_GATHER_CONCURRENCY)
+    return merge_snippets([objective for objective, _ in pairs], results)
+
+async def agather_snippets_from_web(topic: str, objectives: List[str]) -> List[Dict]:
+    """Async variant of gather_snippets_from_web."""
+    pairs = _objective_queries(topic, objectives)
+    results = await abounded_map(_asearch_snippets, [query for _, query in pairs], WEB_GATHER_CONCURRENCY)
+    return merge_snippets([objective for objective, _ in pairs], results)
+
+def search_combined_query(topic: str, objectives: List[str]) -> str:
+    """A single search for the topic and all objectives, used when the per-objective searches find nothing."""
+    query = f" {topic} " + " ".join(objectives)
+    return cached_search(query, lambda q: get_search().run(q))
+
+async def asearch_combined_query(topic: str, objectives: List[str]) -> str:
+    """Async variant of search_combined_query."""
+    query = f" {topic} " + " ".join(objectives)
+    return await acached_search(query, lambda q: get_search().arun(q))
 
 def gather_context_from_web(topic: str, objectives: List[str]) -> str:
     """
     Searches the web for context based on topic and objectives.
     """
-    query = f" {topic} " + " ".join(objectives)
-    results = search.run(query)
-    return results
+    snippets = gather_snippets_from_web(topic, objectives)
+    if snippets:
+        return format_snippets(snippets)
+    # Fall back to a single combined query
+    return search_combined_query(topic, objectives)
 
 def search_for_simple_explanation(topic: str) -> str:
     """
     Specifically searches for simple explanations and analogies for the Feynman Technique.
     """
     query = f" {topic} analogy simple explanation for students ELI5"
-    results = search.run(query)
+    results = cached_search(query, lambda q: get_search().run(q))
     return results
 
-def gather_context_from_notes(topic: str) -> str:
+async def asearch_for_simple_explanation(topic: str) -> str:
+    """Async variant of search_for_simple_explanation."""
+    query = f" {topic} analogy simple explanation for students ELI5"
+    return await acached_search(query, lambda q: get_search().arun(q))
+
+def gather_context_from_notes(topic: str, objectives: Optional[List[str]] = None) -> str:
+    """
+    Gathers context from the user's local notes (NOTES_DIR) via the BM25 notes index.
+    Returns "" when there are no notes or no passage scores high enough, which
+    triggers the fallback to web search.
+    """
+    from notes_store import search_notes
+    return search_notes(topic, objectives)
+
+def local_relevance_coverage(topic: str, objectives: List[str], context: str) -> float:
     """
-    Simulates gathering context from user notes.
-    In a real scenario, this would search a database or local files.
+    Embeds each objective and every context chunk with the local MiniLM model and
+    returns the mean, over objectives, of the best cosine similarity to any chunk.
     """
-    # For now, we return empty to trigger fallback to web search as per requirement
-    return ""
+    from context_utils import get_embeddings, chunk_and_embed
+    # With the embedding service on, the context is split in a worker process and embedded in batches
+    chunks, chunk_vecs = chunk_and_embed(context or "")
+    if not chunks:
+        return 0.0
+    queries = [f"{topic}: {objective}" for objective in objectives] or [topic]
 
-def validate_relevance(topic: str, objectives: List[str], context: str) -> tuple[bool, float]:
+    query_vecs = np.asarray(get_embeddings().embed_documents(queries), dtype=np.float32)
+    query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True) + 1e-12
+    chunk_vecs /= np.linalg.norm(chunk_vecs, axis=1, keepdims=True) + 1e-12
+
+    similarities = query_vecs @ chunk_vecs.T
+    return float(similarities.max(axis=1).mean())
+
+def _coverage_to_score(coverage: float, is_relevant: bool) -> float:
+    # Map onto the LLM's 0-100 scale: accepted contexts land in 70-100, rejected ones in 0-30
+    if is_relevant:
+        span = max(1e-6, 1.0 - RELEVANCE_ACCEPT_THRESHOLD)
+        return 70.0 + 30.0 * min(1.0, (coverage - RELEVANCE_ACCEPT_THRESHOLD) / span)
+    return 30.0 * max(0.0, coverage) / max(1e-6, RELEVANCE_REJECT_THRESHOLD)
+
+def _record_relevance_decision(kind: str) -> None:
+    with _relevance_stats_lock:
+        _relevance_stats[kind] += 1
+
+def get_relevance_stats() -> Dict[str, float]:
+    """Counts of local vs LLM relevance decisions and the share of LLM calls skipped."""
+    with _relevance_stats_lock:
+        stats = dict(_relevance_stats)
+    total = sum(stats.values())
+    stats["llm_skip_rate"] = ((stats["local_accept"] + stats["local_reject"]) / total) if total else 0.0
+    return stats
+
+RELEVANCE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are a context validation expert. Your task is to determine if the provided context is relevant to the learning objectives of a topic."),
+    ("user", "Topic: {topic}\nObjectives: {objectives}\n\nGathered Context: {context}\n\nAssess how relevant and sufficient this context is (0-100%). Respond in JSON format: {{\"score\": <score>, \"is_relevant\": <true/false>}}")
+])
+llm_gateway.register_prompt("relevance", RELEVANCE_PROMPT, JsonOutputParser())
+
+def _local_relevance_decision(topic: str, objectives: List[str], context: str) -> Optional[tuple[bool, float]]:
+    """Returns (is_relevant, score) when the pre-filter is confident, else None."""
+    if not LOCAL_RELEVANCE_ENABLED:
+        return None
+    coverage = local_relevance_coverage(topic, objectives, context)
+    if coverage >= RELEVANCE_ACCEPT_THRESHOLD:
+        _record_relevance_decision("local_accept")
+        print(f"Local relevance pre-filter accepted context (coverage {coverage:.2f}), skipping LLM.")
+        return True, _coverage_to_score(coverage, True)
+    if coverage <= RELEVANCE_REJECT_THRESHOLD:
+        _record_relevance_decision("local_reject")
+        print(f"Local relevance pre-filter rejected context (coverage {coverage:.2f}), skipping LLM.")
+        return False, _coverage_to_score(coverage, False)
+    return None
+
+def validate_relevance(topic: str, objectives: List[str], context: str, bypass_cache: bool = False) -> tuple[bool, float]:
     """
     Uses an LLM to validate if the gathered context is relevant to the objectives.
     Returns (is_relevant, score).
+    Clearly on-topic or clearly off-topic contexts are decided by the local
+    embedding pre-filter; only gray-zone cases reach the LLM.
     """
-    llm = ChatGroq(model="llama-3.3-70b-versatile") 
+    decision = _local_relevance_decision(topic, objectives, context)
+    if decision is not None:
+        return decision
+    _record_relevance_decision("llm")
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a context validation expert. Your task is to determine if the provided context is relevant to the learning objectives of a topic."),
-        ("user", "Topic: {topic}\nObjectives: {objectives}\n\nGathered Context: {context}\n\nAssess how relevant and sufficient this context is (0-100%). Respond in JSON format: {{\"score\": <score>, \"is_relevant\": <true/false>}}")
-    ])
+    result = llm_gateway.invoke("relevance", {"topic": topic, "objectives": ", ".join(objectives), "context": context}, cached=True, bypass_cache=bypass_cache)
     
-    from langchain_core.output_parsers import JsonOutputParser
-    parser = JsonOutputParser()
-    chain = prompt | llm | parser
+    return result.get("is_relevant", False), float(result.get("score", 0.0))
+
+async def avalidate_relevance(topic: str, objectives: List[str], context: str, bypass_cache: bool = False) -> tuple[bool, float]:
+    """Async variant of validate_relevance; the embedding pre-filter runs off the event loop."""
+    decision = await asyncio.to_thread(_local_relevance_decision, topic, objectives, context)
+    if decision is not None:
+        return decision
+    _record_relevance_decision("llm")
     
-    result = chain.invoke({"topic": topic, "objectives": ", ".join(objectives), "context": context})
+    result = await llm_gateway.ainvoke("relevance", {"topic": topic, "objectives": ", ".join(objectives), "context": context}, cached=True, bypass_cache=bypass_cache)
     
     return result.get("is_relevant", False), float(result.get("score", 0.0))
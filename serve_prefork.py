@@ -0,0 +1,175 @@
+"""
+serve_prefork.py - Pre-fork multi-worker server that shares the loaded models copy-on-write.
+
+`uvicorn server:app --workers N` starts N fresh interpreters that each import
+torch and load MiniLM. Here the parent imports the API, loads the embedding
+model, tokenizer and compiled LangGraph graphs once, freezes the GC so those
+objects are never written to again, binds the listening socket and then forks
+the workers. Each worker serves the inherited socket with its own
+uvicorn.Server and shares the parent's model pages until it writes to them.
+
+    python serve_prefork.py --workers 4 --port 8000
+    python serve_prefork.py --report <pid> [<pid> ...]
+
+The parent prints a per-worker memory report (unique vs shared RSS, from
+/proc/<pid>/smaps_rollup) once the workers are up and again on SIGUSR1.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_DELAY = 10.0
+
+
+def preload() -> None:
+    """Loads what the workers would otherwise each load on their own."""
+    from context_utils import get_embeddings
+    from agent import get_app, get_study_app
+
+    # Load only: no inference before fork, so each worker starts its own runtime thread pools
+    get_embeddings()
+    get_study_app()
+    connection_string = os.getenv("DATABASE_URL", "")
+    if "postgresql" not in connection_string:
+        # The Postgres checkpointer opens a connection pool, which must not be shared across fork
+        get_app()
+
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """Returns the kB fields of /proc/<pid>/smaps_rollup (Linux 4.14+)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def memory_report(pids: List[int]) -> str:
+    """One line per process: RSS, PSS, unique (USS = private clean + dirty) and shared memory in MiB."""
+    lines = [f"{'pid':>8} {'rss':>9} {'pss':>9} {'unique':>9} {'shared':>9}"]
+    total_unique = 0
+    for pid in pids:
+        try:
+            m = smaps_rollup(pid)
+        except OSError as e:
+            lines.append(f"{pid:>8} unavailable ({e})")
+            continue
+        unique = m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+        shared = m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0)
+        total_unique += unique
+        lines.append(
+            f"{pid:>8} {m.get('Rss', 0) / 1024:>8.1f}M {m.get('Pss', 0) / 1024:>8.1f}M "
+            f"{unique / 1024:>8.1f}M {shared / 1024:>8.1f}M"
+        )
+    lines.append(f"Total unique: {total_unique / 1024:.1f}M")
+    return "\n".join(lines)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+    # Default signal handlers again; uvicorn installs its own for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            # Connections pooled by the parent (database.py connects once at import) must not be
+            # shared across processes: drop them from this child's pool without closing the parent's sockets
+            from backend.database import engine
+            engine.dispose(close=False)
+            run_worker(app, sock, log_level)
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(host: str, port: int, workers: int, log_level: str) -> None:
+    start = time.perf_counter()
+    from backend.main import app
+    preload()
+    print(f"--- Preloaded models in the parent in {time.perf_counter() - start:.1f}s ---")
+
+    # Move everything allocated so far out of the collector's reach; otherwise
+    # GC passes in the workers touch these objects and un-share their pages.
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(host, port)
+    children = {spawn(app, sock, log_level) for _ in range(workers)}
+    print(f"✅ Serving on http://{host}:{port} with {workers} pre-forked workers (parent {os.getpid()})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(signum=None, frame=None):
+        print(memory_report([os.getpid()] + sorted(children)))
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, report)
+    signal.signal(signal.SIGALRM, report)
+    signal.alarm(int(REPORT_DELAY))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited with status {status}; restarting it.")
+            children.add(spawn(app, sock, log_level))
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork server for the Autonomous Learning Agent API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report", type=int, nargs="+", metavar="PID", help="print the memory report for these processes and exit")
+    args = parser.parse_args()
+
+    if args.report:
+        print(memory_report(args.report))
+    else:
+        serve(args.host, args.port, args.workers, args.log_level)
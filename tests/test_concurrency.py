@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from concurrency import bounded_map, abounded_map
+
+
+def test_bounded_map_keeps_input_order():
+    # Later items finish first, results must still follow the input
+    delays = [0.05, 0.04, 0.03, 0.02, 0.01]
+
+    def work(delay):
+        time.sleep(delay)
+        return delay
+
+    assert bounded_map(work, delays, max_in_flight=5) == delays
+
+
+def test_bounded_map_caps_concurrency():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return item * 2
+
+    assert bounded_map(work, range(10), max_in_flight=3) == [i * 2 for i in range(10)]
+    assert peak[0] <= 3
+
+
+def test_bounded_map_reraises_errors():
+    def work(item):
+        if item == 2:
+            raise ValueError("boom")
+        return item
+
+    with pytest.raises(ValueError):
+        bounded_map(work, range(4), max_in_flight=2)
+
+
+def test_bounded_map_empty():
+    assert bounded_map(lambda x: x, []) == []
+
+
+def test_abounded_map_keeps_input_order_and_caps_concurrency():
+    running, peak = [0], [0]
+
+    async def work(item):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01 * (5 - item))
+        running[0] -= 1
+        return item
+
+    assert asyncio.run(abounded_map(work, range(5), max_in_flight=2)) == list(range(5))
+    assert peak[0] <= 2
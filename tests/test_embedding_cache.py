@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache, text_digest
+
+
+def _vectors(*rows):
+    return np.asarray(rows, dtype=np.float32)
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    a, b = text_digest("a"), text_digest("b")
+    assert cache.get_many([a]) == {}
+    cache.put_many([a, b], _vectors([1, 2], [3, 4]))
+    found = cache.get_many([a, b])
+    assert found[a].tolist() == [1, 2] and found[b].tolist() == [3, 4]
+    assert cache.stats()["rows"] == 2
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_two_instances_on_one_directory_see_each_others_rows(tmp_path):
+    # Each instance stands in for a worker process with its own mapping of the same files
+    first, second = EmbeddingCache(str(tmp_path)), EmbeddingCache(str(tmp_path))
+    a, b = text_digest("a"), text_digest("b")
+    first.put_many([a], _vectors([1, 0]))
+    assert second.get_many([a])[a].tolist() == [1, 0]
+    second.put_many([b, a], _vectors([0, 1], [9, 9]))
+    found = first.get_many([a, b])
+    # The row `first` wrote is kept; `second` only appended the digest it did not have
+    assert found[a].tolist() == [1, 0] and found[b].tolist() == [0, 1]
+    assert first.stats()["rows"] == second.stats()["rows"] == 2
+
+
+def test_unindexed_rows_from_a_crashed_writer_are_truncated(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    a, b = text_digest("a"), text_digest("b")
+    cache.put_many([a], _vectors([1, 2]))
+    # A writer that died between appending vectors and appending their digests
+    with open(os.path.join(str(tmp_path), "vectors.f32"), "ab") as f:
+        f.write(_vectors([7, 7], [7, 7]).tobytes())
+    cache.put_many([b], _vectors([3, 4]))
+    fresh = EmbeddingCache(str(tmp_path))
+    found = fresh.get_many([a, b])
+    assert found[a].tolist() == [1, 2] and found[b].tolist() == [3, 4]
+    assert os.path.getsize(os.path.join(str(tmp_path), "vectors.f32")) == 2 * 2 * 4
+
+
+def test_full_cache_stops_storing(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_rows=1)
+    a, b = text_digest("a"), text_digest("b")
+    cache.put_many([a], _vectors([1, 2]))
+    cache.put_many([b], _vectors([3, 4]))
+    assert cache.get_many([b]) == {}
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return [float(len(text)), 2.0]
+
+
+def test_cached_embeddings_only_sends_misses_in_batches(tmp_path):
+    base = CountingEmbeddings()
+    embeddings = CachedEmbeddings(base, namespace="model/v1", directory=str(tmp_path), batch_size=2)
+    assert embeddings.embed_documents(["a", "bb", "ccc", "a"]) == [[1, 1], [2, 1], [3, 1], [1, 1]]
+    assert base.calls == [["a", "bb"], ["ccc"]]
+    assert embeddings.embed_documents(["bb", "dddd"]) == [[2, 1], [4, 1]]
+    assert base.calls[-1] == ["dddd"]
+    # Queries are keyed apart from documents with the same text
+    assert embeddings.embed_query("a") == [1, 2]
+    assert embeddings.embed_query("a") == [1, 2]
+    assert base.calls[-1] == ["a"] and len(base.calls) == 4
@@ -0,0 +1,100 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import jobs
+from backend.database import Base, Job
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", session_factory)
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Records job ids handed to the worker pool instead of running them."""
+    ids = []
+
+    class Executor:
+        def submit(self, fn, job_id):
+            ids.append(job_id)
+
+    monkeypatch.setattr(jobs, "_executor", Executor())
+    return ids
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _job(db, status, owner=None, age_seconds=0):
+    updated = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=age_seconds)
+    job = Job(id=f"job{db.query(Job).count()}", user_id=1, status=status, payload={}, owner=owner, updated_at=updated)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def _status(db, job_id):
+    db.expire_all()
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def test_claim_is_exclusive_and_records_the_owner(db):
+    job_id = _job(db, jobs.QUEUED)
+    assert jobs._claim(db, job_id)
+    assert not jobs._claim(db, job_id)
+    job = _status(db, job_id)
+    assert job.status == jobs.RUNNING
+    assert job.owner == jobs.current_owner()
+
+
+def test_running_job_of_a_dead_process_is_resumed_immediately(db, submitted):
+    owner = f"{jobs._HOST}:{_dead_pid()}:abcd1234"
+    job_id = _job(db, jobs.RUNNING, owner=owner)
+    assert jobs.resume_pending_jobs() == 1
+    assert submitted == [job_id]
+    job = _status(db, job_id)
+    assert job.status == jobs.QUEUED and job.owner is None
+
+
+def test_running_job_of_a_live_process_is_left_alone(db, submitted):
+    job_id = _job(db, jobs.RUNNING, owner=jobs.current_owner())
+    assert jobs.resume_pending_jobs() == 0
+    assert submitted == []
+    assert _status(db, job_id).status == jobs.RUNNING
+
+
+def test_previous_boot_of_this_process_counts_as_gone():
+    assert jobs.owner_is_gone(f"{jobs._HOST}:{os.getpid()}:previous")
+    assert not jobs.owner_is_gone(jobs.current_owner())
+    assert not jobs.owner_is_gone(f"some-other-host:{os.getpid()}:abcd1234")
+
+
+def test_unverifiable_owners_fall_back_to_the_stale_timeout(db, submitted):
+    fresh = _job(db, jobs.RUNNING, owner="some-other-host:1:abcd1234")
+    stale = _job(db, jobs.RUNNING, owner=None, age_seconds=jobs.JOB_STALE_SECONDS + 60)
+    assert jobs.resume_pending_jobs() == 1
+    assert submitted == [stale]
+    assert _status(db, fresh).status == jobs.RUNNING
+
+
+def test_sweep_skips_queued_jobs(db, submitted):
+    _job(db, jobs.QUEUED)
+    dead = _job(db, jobs.RUNNING, owner=f"{jobs._HOST}:{_dead_pid()}:abcd1234")
+    assert jobs.resume_pending_jobs(include_queued=False) == 1
+    assert submitted == [dead]
@@ -0,0 +1,52 @@
+import llm_cache
+from llm_cache import LLMCache, make_key
+
+
+def test_make_key_is_stable_and_ignores_input_order():
+    a = make_key("model", "template", {"topic": "x", "context": "y"})
+    b = make_key("model", "template", {"context": "y", "topic": "x"})
+    assert a == b
+    assert len(a) == 64
+
+
+def test_make_key_changes_with_model_template_and_inputs():
+    base = make_key("model", "template", {"topic": "x"})
+    assert make_key("other", "template", {"topic": "x"}) != base
+    assert make_key("model", "other", {"topic": "x"}) != base
+    assert make_key("model", "template", {"topic": "z"}) != base
+
+
+def test_round_trip_and_hit_counters(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "cache.db"))
+    assert cache.get("k") == (False, None)
+    cache.set("k", {"mcqs": [1, 2]})
+    assert cache.get("k") == (True, {"mcqs": [1, 2]})
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses_and_dropped(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(path=str(tmp_path / "cache.db"), ttl_seconds=60)
+    cache.set("k", "value")
+    now[0] += 59
+    assert cache.get("k") == (True, "value")
+    now[0] += 2
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LLMCache(path=str(tmp_path / "cache.db"), max_entries=2)
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.set(key, key)
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.set("c", "c")
+    assert cache.get("a")[0] and cache.get("c")[0]
+    assert cache.get("b") == (False, None)
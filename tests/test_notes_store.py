@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+import notes_store
+from notes_store import NotesIndex, split_passages, tokenize
+
+
+def _write(directory, name, text):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def notes(tmp_path):
+    notes_dir = tmp_path / "notes"
+    notes_dir.mkdir()
+    _write(notes_dir, "transformers.md", "Attention lets transformers weigh tokens. Self attention attention attention.")
+    _write(notes_dir, "cnn.md", "Convolutions slide filters over images. Pooling reduces resolution.")
+    _write(notes_dir, "mixed.txt", "Transformers replaced recurrent networks for translation.")
+    _write(notes_dir, "ignored.pdf", "attention")
+    return NotesIndex(notes_dir=str(notes_dir), index_path=str(tmp_path / "index.db"))
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("What is the Attention in a GPT-2 x") == ["attention", "gpt"]
+
+
+def test_split_passages_groups_paragraphs_up_to_the_limit():
+    text = "one\n\ntwo\n\n" + "x" * 20
+    assert split_passages(text, max_chars=10) == ["one\n\ntwo", "x" * 20]
+
+
+def test_first_refresh_always_indexes(notes, monkeypatch):
+    # Shortly after boot the monotonic clock can be below the refresh interval
+    monkeypatch.setattr(notes_store.time, "monotonic", lambda: 1.0)
+    assert notes.refresh() == 3
+    assert notes.refresh() == 0
+
+
+def test_bm25_ranks_the_most_relevant_passage_first(notes):
+    notes.refresh()
+    results = notes.search("attention transformers")
+    assert [path for _, path, _ in results] == ["transformers.md", "mixed.txt"]
+    assert results[0][0] > results[1][0]
+    assert notes.search("quantum chromodynamics") == []
+
+
+def test_refresh_picks_up_changed_and_deleted_files(notes):
+    notes.refresh()
+    os.remove(os.path.join(notes.notes_dir, "cnn.md"))
+    _write(notes.notes_dir, "mixed.txt", "Pooling layers after convolutions.")
+    assert notes.refresh(force=True) == 2
+    assert [path for _, path, _ in notes.search("pooling")] == ["mixed.txt"]
+
+
+def test_search_notes_truncates_a_passage_longer_than_the_budget(notes, monkeypatch):
+    _write(notes.notes_dir, "long.md", "attention " * 200)
+    monkeypatch.setattr(notes_store, "get_notes_index", lambda: notes)
+    context = notes_store.search_notes("attention", min_score=0.0, max_chars=100)
+    assert context.startswith("[long.md] attention")
+    assert len(context) <= 100 + len("[long.md] ")
@@ -0,0 +1,75 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import numpy_vector_store
+from numpy_vector_store import NumpyVectorStore
+
+VOCAB = ["cat", "dog", "car", "road"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per vocabulary word, so similarities are easy to reason about."""
+
+    def embed_documents(self, texts):
+        return [[float(text.count(word)) + 1e-3 for word in VOCAB] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _store():
+    return NumpyVectorStore.from_texts(["cat cat", "dog", "car road", "cat dog"], KeywordEmbeddings())
+
+
+def test_similarity_search_returns_best_matches_first():
+    docs = _store().similarity_search("cat", k=2)
+    assert [d.page_content for d in docs] == ["cat cat", "cat dog"]
+
+
+def test_scores_are_cosine_similarities():
+    (doc, score), = _store().similarity_search_with_score("car road", k=1)
+    assert doc.page_content == "car road"
+    assert np.isclose(score, 1.0, atol=1e-3)
+
+
+def test_batch_search_matches_single_searches():
+    store = _store()
+    queries = ["dog", "road", "cat"]
+    batched = store.batch_similarity_search(queries, k=2)
+    single = [store.similarity_search(q, k=2) for q in queries]
+    assert [[d.page_content for d in docs] for docs in batched] == [[d.page_content for d in docs] for docs in single]
+
+
+def test_k_larger_than_store_and_delete():
+    store = _store()
+    assert len(store.similarity_search("cat", k=10)) == 4
+    ids = store.add_texts(["road road"])
+    store.delete(ids)
+    assert "road road" not in [d.page_content for d in store.similarity_search("road", k=10)]
+    assert NumpyVectorStore(KeywordEmbeddings()).similarity_search("cat") == []
+
+
+def test_from_vectors_uses_precomputed_rows():
+    vectors = np.asarray(KeywordEmbeddings().embed_documents(["dog", "car"]), dtype=np.float32)
+    store = NumpyVectorStore.from_vectors(["dog", "car"], vectors, KeywordEmbeddings())
+    assert store.similarity_search("car", k=1)[0].page_content == "car"
+
+
+def test_get_store_builds_once_and_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(numpy_vector_store, "_stores", numpy_vector_store.OrderedDict())
+    monkeypatch.setattr(numpy_vector_store, "MAX_CACHED_INDEXES", 2)
+    builds = []
+
+    def build(name):
+        def run():
+            builds.append(name)
+            return NumpyVectorStore(KeywordEmbeddings())
+        return run
+
+    first = numpy_vector_store.get_store("a", build("a"))
+    assert numpy_vector_store.get_store("a", build("a")) is first
+    numpy_vector_store.get_store("b", build("b"))
+    numpy_vector_store.get_store("a", build("a"))
+    numpy_vector_store.get_store("c", build("c"))
+    numpy_vector_store.get_store("b", build("b"))
+    assert builds == ["a", "b", "c", "b"]
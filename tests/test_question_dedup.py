@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import question_dedup
+from models import MCQ
+from question_dedup import bounded_avoid_list, duplicate_mask
+
+# Questions are embedded by their first word, so "alpha ..." questions are duplicates of each other
+WORDS = ["old", "alpha", "beta", "gamma", "delta", "topic"]
+
+
+def _embed(questions):
+    if not questions:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.asarray([[q.split()[0] == w for w in WORDS] for q in questions], dtype=np.float32) + 1e-3
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _mcq(question):
+    return MCQ(question=question, options=["a", "b", "c", "d"], correct_index=0)
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Serves the given batches in order and records each generate_mcqs call."""
+    monkeypatch.setattr(question_dedup, "embed_questions", _embed)
+    calls, batches = [], []
+
+    def generate(context, topic, **kwargs):
+        calls.append(kwargs)
+        return [_mcq(q) for q in batches[len(calls) - 1]]
+
+    async def agenerate(context, topic, **kwargs):
+        return generate(context, topic, **kwargs)
+
+    monkeypatch.setattr(question_dedup, "generate_mcqs", generate)
+    monkeypatch.setattr(question_dedup, "agenerate_mcqs", agenerate)
+    return calls, batches
+
+
+def test_duplicate_mask_checks_history_and_earlier_candidates():
+    mask = duplicate_mask(_embed(["alpha 1", "beta 1", "beta 2", "gamma 1"]), _embed(["alpha 0"]))
+    assert mask.tolist() == [True, False, True, False]
+
+
+def test_bounded_avoid_list_keeps_the_closest_history():
+    history = ["alpha 0", "beta 0", "gamma 0"]
+    assert bounded_avoid_list(history, _embed(history), _embed(["gamma x"]), size=1) == ["gamma 0"]
+    assert bounded_avoid_list([], _embed([]), _embed(["gamma x"])) == []
+
+
+def test_unique_questions_are_accepted_in_one_call(fake_llm):
+    calls, batches = fake_llm
+    batches.append(["alpha 1", "beta 1", "gamma 1"])
+    mcqs = question_dedup.generate_unique_mcqs("context", "topic", [])
+    assert [m.question for m in mcqs] == ["alpha 1", "beta 1", "gamma 1"]
+    assert len(calls) == 1
+    assert calls[0]["bypass_cache"] is False
+
+
+def test_duplicates_are_regenerated_without_the_cache(fake_llm):
+    calls, batches = fake_llm
+    batches.extend([["old 1", "alpha 1", "alpha 2"], ["beta 1", "gamma 1"]])
+    mcqs = question_dedup.generate_unique_mcqs("context", "topic", ["old 0"])
+    assert [m.question for m in mcqs] == ["alpha 1", "beta 1", "gamma 1"]
+    # A history means the first call must not be served from the LLM cache either
+    assert [c["bypass_cache"] for c in calls] == [True, True]
+    assert calls[1]["count"] == 2
+    assert calls[1]["seen_questions"][:2] == ["old 1", "alpha 2"]
+
+
+def test_falls_back_to_the_first_batch_when_everything_collides(fake_llm, monkeypatch):
+    monkeypatch.setattr(question_dedup, "QUESTION_REGEN_ROUNDS", 1)
+    calls, batches = fake_llm
+    batches.extend([["old 1", "old 2"], ["old 3", "old 4"]])
+    mcqs = question_dedup.generate_unique_mcqs("context", "topic", ["old 0"])
+    assert [m.question for m in mcqs] == ["old 1", "old 2"]
+    assert len(calls) == 2
+
+
+def test_async_variant_matches_sync(fake_llm):
+    calls, batches = fake_llm
+    batches.extend([["alpha 1", "alpha 2", "beta 1"], ["gamma 1"]])
+    mcqs = asyncio.run(question_dedup.agenerate_unique_mcqs("context", "topic", []))
+    assert [m.question for m in mcqs] == ["alpha 1", "beta 1", "gamma 1"]
+    assert [c["bypass_cache"] for c in calls] == [False, True]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import context_utils
+import llm_cache
+import llm_gateway
+import remediation
+from context_utils import _parse_feynman_batch
+from llm_cache import LLMCache
+
+
+class FakeChain:
+    """Returns canned responses and records the inputs of every call."""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def invoke(self, inputs):
+        self.calls.append(inputs)
+        return self.response(inputs) if callable(self.response) else self.response
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMCache(path=str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(llm_cache, "get_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def chains(monkeypatch, cache):
+    # A batch response that skips concept 1, and per-concept responses that echo the topic
+    chains = {
+        "feynman_batch": FakeChain({"explanations": [{"index": 0, "explanation": "batched a"}, {"index": 2, "explanation": "batched c"}]}),
+        "feynman": FakeChain(lambda inputs: f"simple {inputs['topic']}"),
+    }
+    monkeypatch.setattr(llm_gateway, "get_chain", lambda name, timeout=None: chains[name])
+    monkeypatch.setattr(llm_gateway, "_template_fingerprint", lambda name: name)
+    monkeypatch.setattr(context_utils, "retrieve_context", lambda context, queries, **kwargs: context)
+    monkeypatch.setattr(remediation, "search_for_simple_explanation", lambda topic: f"web {topic}")
+
+    async def asearch(topic):
+        return f"web {topic}"
+    monkeypatch.setattr(remediation, "asearch_for_simple_explanation", asearch)
+    return chains
+
+
+def test_parse_feynman_batch_orders_by_index():
+    result = {"explanations": [{"index": 1, "explanation": "b"}, {"index": 0, "explanation": "a"}]}
+    assert _parse_feynman_batch(result, 2) == ["a", "b"]
+
+
+def test_parse_feynman_batch_rejects_missing_indices():
+    with pytest.raises(ValueError):
+        _parse_feynman_batch({"explanations": [{"index": 0, "explanation": "a"}]}, 2)
+
+
+def test_batch_with_missing_index_falls_back_to_per_concept_calls(chains):
+    explanations = remediation.explain_concepts(["a", "b", "c"], "context", batched=True)
+    assert explanations == ["simple a", "simple b", "simple c"]
+    assert len(chains["feynman_batch"].calls) == 1
+    assert sorted(call["topic"] for call in chains["feynman"].calls) == ["a", "b", "c"]
+
+
+def test_async_batch_with_missing_index_falls_back_to_per_concept_calls(chains):
+    explanations = asyncio.run(remediation.aexplain_concepts(["a", "b", "c"], "context", batched=True))
+    assert explanations == ["simple a", "simple b", "simple c"]
+    assert len(chains["feynman"].calls) == 3
+
+
+def test_malformed_batch_response_is_not_cached(chains, cache):
+    remediation.explain_concepts(["a", "b", "c"], "context", batched=True)
+    remediation.explain_concepts(["a", "b", "c"], "context", batched=True)
+    # The bad batch is re-requested instead of being served from the cache
+    assert len(chains["feynman_batch"].calls) == 2
+    # The valid per-concept answers were cached on the first run
+    assert len(chains["feynman"].calls) == 3
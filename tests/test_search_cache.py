@@ -0,0 +1,61 @@
+import pytest
+
+import search_cache
+from search_cache import TTLCache, cached_search, normalize_query
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = TTLCache(ttl_seconds=60, max_entries=2)
+    monkeypatch.setattr(search_cache, "cache", cache)
+    monkeypatch.setattr(search_cache, "SEARCH_SNAPSHOT_MODE", "")
+    return cache
+
+
+def test_normalize_query():
+    assert normalize_query("  Neural   NETWORKS ") == "neural networks"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl_seconds=10, max_entries=4)
+    cache.set("k", "v")
+    now[0] += 10
+    assert cache.get("k") == (True, "v")
+    now[0] += 1
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+def test_cached_search_fetches_once_per_normalized_query(fresh_cache):
+    calls = []
+
+    def fetch(query):
+        calls.append(query)
+        return f"results for {query}"
+
+    assert cached_search("Python  GIL", fetch) == "results for Python  GIL"
+    assert cached_search("python gil", fetch) == "results for Python  GIL"
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_cached(fresh_cache):
+    def failing(query):
+        raise RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        cached_search("topic", failing)
+    assert fresh_cache.stats()["entries"] == 0
+    assert cached_search("topic", lambda q: "ok") == "ok"
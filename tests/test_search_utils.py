@@ -0,0 +1,60 @@
+import pytest
+
+import search_cache
+import search_utils
+from search_utils import format_snippets, merge_snippets
+
+
+def test_merge_snippets_drops_duplicate_links_and_texts():
+    results = [
+        [
+            {"title": "A", "link": "https://a", "snippet": "Gradient descent minimizes loss."},
+            {"title": "B", "link": "https://b", "snippet": "Backpropagation computes gradients."},
+        ],
+        [
+            {"title": "A again", "link": "https://a", "snippet": "Different text, same page."},
+            {"title": "C", "link": "https://c", "snippet": "  gradient descent   MINIMIZES loss. "},
+            {"title": "D", "link": "https://d", "snippet": "Learning rate schedules."},
+        ],
+    ]
+    merged = merge_snippets(["descent", "backprop"], results)
+    assert [s["link"] for s in merged] == ["https://a", "https://b", "https://d"]
+    assert merged[0]["objectives"] == ["descent", "backprop"]
+    assert merged[1]["objectives"] == ["descent"]
+    assert merged[2]["objectives"] == ["backprop"]
+
+
+def test_merge_snippets_skips_empty_snippets_and_keeps_linkless_ones():
+    results = [[{"title": "", "snippet": "  "}, {"title": "", "snippet": "No link here."}]]
+    merged = merge_snippets(["obj"], results)
+    assert [s["text"] for s in merged] == ["No link here."]
+    assert format_snippets(merged) == "[obj] No link here."
+
+
+def test_merge_snippets_does_not_repeat_an_objective():
+    hit = {"title": "T", "link": "https://t", "snippet": "text"}
+    merged = merge_snippets(["same", "same"], [[hit], [hit]])
+    assert merged[0]["objectives"] == ["same"]
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = search_cache.TTLCache(ttl_seconds=60, max_entries=16)
+    monkeypatch.setattr(search_cache, "cache", cache)
+    monkeypatch.setattr(search_cache, "SEARCH_SNAPSHOT_MODE", "")
+    return cache
+
+
+def test_failed_snippet_search_returns_empty_and_is_retried(fresh_cache, monkeypatch):
+    outcomes = [RuntimeError("rate limited"), [{"title": "T", "link": "https://t", "snippet": "text"}]]
+
+    def fetch(query):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(search_utils, "_fetch_snippets", fetch)
+    assert search_utils._search_snippets("topic objective") == []
+    assert fresh_cache.stats()["entries"] == 0
+    assert search_utils._search_snippets("topic objective")[0]["link"] == "https://t"
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import semantic_cache
+from backend.database import Base, MasterySession
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(semantic_cache, "_index", None)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _persist(db, vector, summary="summary"):
+    row = MasterySession(topic="t", objectives=[], summary=summary, topic_embedding=vector.tobytes())
+    db.add(row)
+    db.commit()
+    return row
+
+
+def test_lookup_matches_above_threshold_only(db):
+    row = _persist(db, _unit(1, 0, 0))
+    source, similarity = semantic_cache.lookup(db, _unit(1, 0.01, 0), threshold=0.9)
+    assert source.id == row.id and similarity > 0.9
+    source, _ = semantic_cache.lookup(db, _unit(0, 1, 0), threshold=0.9)
+    assert source is None
+
+
+def test_sessions_persisted_by_another_process_are_found(db):
+    _persist(db, _unit(1, 0, 0))
+    semantic_cache.get_index(db)
+    # Written by "another worker": this process never called remember() for it
+    other = _persist(db, _unit(0, 0, 1))
+    source, _ = semantic_cache.lookup(db, _unit(0, 0, 1), threshold=0.9)
+    assert source.id == other.id
+
+
+def test_remembered_sessions_are_not_added_twice(db):
+    _persist(db, _unit(1, 0, 0))
+    index = semantic_cache.get_index(db)
+    row = _persist(db, _unit(0, 1, 0))
+    semantic_cache.remember(db, row.id, _unit(0, 1, 0))
+    assert semantic_cache.refresh(db) == 1
+    assert len(index) == 2
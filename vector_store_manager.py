@@ -0,0 +1,141 @@
+"""
+vector_store_manager.py - Persistent, namespaced Chroma collections for per-session retrieval.
+
+Each context gets its own collection, named from its content hash (or an
+explicit namespace such as a session id), stored under VECTOR_STORE_DIR so it
+survives restarts and is reused instead of re-embedded. A small registry
+tracks chunk counts and last use; once the store exceeds its collection or
+chunk budget, the least recently used collections are deleted.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "./vector_store")
+VECTOR_STORE_MAX_COLLECTIONS = int(os.getenv("VECTOR_STORE_MAX_COLLECTIONS", "200"))
+# Chunk count is the budget proxy: each chunk costs one embedding row on disk and in the HNSW index
+VECTOR_STORE_MAX_CHUNKS = int(os.getenv("VECTOR_STORE_MAX_CHUNKS", "50000"))
+
+
+def collection_name(namespace: str) -> str:
+    """Chroma names must be 3-63 chars of [a-zA-Z0-9._-]."""
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in str(namespace))
+    return f"ctx_{safe[:48]}"
+
+
+class VectorStoreManager:
+    """Creates, reuses and evicts persistent per-namespace Chroma collections."""
+
+    def __init__(self, persist_dir: str = VECTOR_STORE_DIR, max_collections: int = VECTOR_STORE_MAX_COLLECTIONS, max_chunks: int = VECTOR_STORE_MAX_CHUNKS):
+        import chromadb
+        os.makedirs(persist_dir, exist_ok=True)
+        self.max_collections = max_collections
+        self.max_chunks = max_chunks
+        self._client = chromadb.PersistentClient(path=persist_dir)
+        self._stores: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        self._registry = sqlite3.connect(os.path.join(persist_dir, "registry.db"), check_same_thread=False)
+        self._registry.execute(
+            "CREATE TABLE IF NOT EXISTS collections (name TEXT PRIMARY KEY, chunks INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._registry.commit()
+
+    def _touch(self, name: str, chunks: Optional[int] = None) -> None:
+        if chunks is None:
+            self._registry.execute("UPDATE collections SET last_used = ? WHERE name = ?", (time.time(), name))
+        else:
+            self._registry.execute(
+                "INSERT OR REPLACE INTO collections (name, chunks, last_used) VALUES (?, ?, ?)",
+                (name, chunks, time.time()),
+            )
+        self._registry.commit()
+
+    def _open(self, name: str):
+        from langchain_community.vectorstores import Chroma
+        from context_utils import get_embeddings
+        return Chroma(client=self._client, collection_name=name, embedding_function=get_embeddings())
+
+    def get_store(self, namespace: str, load_chunks: Callable[[], List[str]]):
+        """
+        Returns the vector store for `namespace`. An existing collection (from this
+        or an earlier process) is reopened without re-embedding; otherwise
+        `load_chunks()` is embedded into a new one.
+        """
+        from context_utils import setup_vector_store
+        name = collection_name(namespace)
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                existing = self._registry.execute("SELECT chunks FROM collections WHERE name = ?", (name,)).fetchone()
+                if existing is not None and existing[0] > 0:
+                    store = self._open(name)
+                    if store._collection.count() == 0:
+                        store = None
+            if store is not None:
+                self._stores[name] = store
+                self._touch(name)
+                return store
+
+            chunks = load_chunks()
+            store = setup_vector_store(chunks, collection_name=name, client=self._client)
+            self._stores[name] = store
+            self._touch(name, len(chunks))
+            self._evict(keep=name)
+            return store
+
+    def _evict(self, keep: str) -> None:
+        rows = self._registry.execute("SELECT name, chunks FROM collections ORDER BY last_used ASC").fetchall()
+        count = len(rows)
+        total_chunks = sum(chunks for _, chunks in rows)
+        for name, chunks in rows:
+            if count <= self.max_collections and total_chunks <= self.max_chunks:
+                break
+            if name == keep:
+                continue
+            self.delete(name)
+            count -= 1
+            total_chunks -= chunks
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self._stores.pop(name, None)
+            try:
+                self._client.delete_collection(name)
+            except Exception:
+                pass  # Already gone
+            self._registry.execute("DELETE FROM collections WHERE name = ?", (name,))
+            self._registry.commit()
+
+    def stats(self) -> Dict[str, int]:
+        count, chunks = self._registry.execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM collections").fetchone()
+        return {
+            "collections": count,
+            "chunks": chunks,
+            "open": len(self._stores),
+            "max_collections": self.max_collections,
+            "max_chunks": self.max_chunks,
+        }
+
+
+_manager: Optional[VectorStoreManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_stats() -> Optional[Dict[str, int]]:
+    """Stats of the shared manager, or None if nothing has opened it yet (avoids loading Chroma)."""
+    return _manager.stats() if _manager is not None else None
+
+
+def get_manager() -> VectorStoreManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = VectorStoreManager()
+    return _manager